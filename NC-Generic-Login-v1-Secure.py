@@ -1,72 +1,43 @@
 import streamlit as st
 import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 
-def get_google_sheets_client():
+from ncdash import trace, warmup
+from ncdash.permissions import shared_store
+
+def get_permissions_store():
+    """
+    Process-wide permissions store, refreshed in the background every 5 minutes.
+    Logins are served from the last-known-good snapshot on disk until the
+    first fetch of a new process completes; the process warm-up normally
+    creates it and starts that fetch before anyone opens this page.
+    Set NC_PERMISSIONS_FILE (or the permissions_file secret) to a CSV/JSON file
+    to use a local stand-in instead of Google Sheets; it is read directly and
+    never snapshotted, so its test accounts cannot reach a Sheets-backed process.
+    """
+    return shared_store(st.secrets)
+
+def get_permission_users():
     """
-    Initialize Google Sheets client using service account credentials
+    Current email -> permission record map ({} if permissions are unavailable)
     """
     try:
-        # Get credentials from Streamlit secrets
-        credentials_dict = st.secrets["google_service_account"]
-        
-        # Define the scope
-        scope = [
-            "https://spreadsheets.google.com/feeds",
-            "https://www.googleapis.com/auth/drive"
-        ]
-        
-        # Create credentials
-        credentials = Credentials.from_service_account_info(
-            credentials_dict, 
-            scopes=scope
-        )
-        
-        # Initialize the client
-        client = gspread.authorize(credentials)
-        return client
-    
+        store = get_permissions_store()
     except Exception as e:
-        st.error(f"Authentication failed: {str(e)}")
+        st.error(f"Failed to load permissions from Google Sheets: {str(e)}")
+        return {}
+    
+    users = store.users()
+    if store.last_error is not None and not users:
+        st.error(f"Failed to load permissions from Google Sheets: {str(store.last_error)}")
         st.error("Please check your Google service account configuration.")
-        return None
+    return users
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
 def load_permissions():
     """
-    Load permissions from Google Sheets
+    Load permissions as a DataFrame (used by the debug panel)
     """
-    try:
-        client = get_google_sheets_client()
-        if client is None:
-            return pd.DataFrame()
-        
-        # Get the Google Sheet ID from secrets
-        sheet_id = st.secrets["google_sheet_id"]
-        
-        # Open the sheet
-        sheet = client.open_by_key(sheet_id)
-        
-        # Get the first worksheet (or specify by name)
-        worksheet = sheet.get_worksheet(0)  # First sheet
-        # Or use: worksheet = sheet.worksheet("Sheet1")  # By name
-        
-        # Get all records
-        records = worksheet.get_all_records()
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(records)
-        
-        # Ensure email column is lowercase for consistency
-        if 'email' in df.columns:
-            df['email'] = df['email'].str.lower().str.strip()
-        
-        return df
-    
-    except Exception as e:
-        st.error(f"Failed to load permissions from Google Sheets: {str(e)}")
-        return pd.DataFrame()
+    with trace.span("load_permissions"):
+        return pd.DataFrame(list(get_permission_users().values()))
 
 # Streamlit UI
 st.set_page_config(page_title="Nature Counter DATAframe Login", layout="centered")
@@ -75,25 +46,39 @@ st.title("🔐 NC DATA Dashboard Login")
 # Add security notice
 st.info("🔒 This dashboard uses secure authentication via Google Sheets.")
 
+# Warm the process on its first run: preload the shared data and the chart
+# libraries and start the permissions fetch in the background, so none of them
+# waits for the first sign-in (ncdash/warmup.py). Workers started warmed up
+# have done this already, and then both calls return immediately
+warmup.start()
+try:
+    get_permissions_store().prefetch()
+except Exception:
+    # Reported by get_permission_users when someone signs in
+    pass
+
+# Time the permission lookup of this rerun (NC_TRACE=1)
+run = trace.begin("Login")
+
 email = st.text_input("Enter your email:", placeholder="example@company.com").strip().lower()
 
 if email:
-    with st.spinner("Authenticating..."):
-        permissions = load_permissions()
+    with st.spinner("Authenticating..."), trace.span("load_permissions"):
+        users = get_permission_users()
     
-    if permissions.empty:
+    if not users:
         st.error("Unable to load permissions. Please contact your administrator.")
+        trace.end()
         st.stop()
     
-    # Check if email exists
-    match = permissions[permissions["email"] == email]
+    # Check if email exists (dict lookup by normalized email)
+    user_data = get_permissions_store().lookup(email)
     
-    if match.empty:
+    if user_data is None:
         st.error("Email not found. Access denied.")
         st.error("Please contact your administrator if you believe this is an error.")
     else:
         # Store user data in session state
-        user_data = match.iloc[0]
         st.session_state["user_email"] = email
         st.session_state["user_role"] = user_data["role"]
         st.session_state["user_name"] = user_data.get("name", "User")
@@ -125,4 +110,9 @@ if st.checkbox("Show Debug Info (Development Only)"):
         if not permissions.empty:
             st.write("**Registered Users:**")
             # Only show emails and roles, not sensitive data
-            st.dataframe(permissions[['email', 'role']])
\ No newline at end of file
+            st.dataframe(permissions[['email', 'role']])
+
+# Timing breakdown of this rerun (only recorded with NC_TRACE=1)
+trace.end()
+if run is not None and st.session_state.get("user_role") == "admin":
+    st.expander("⏱️ Timings").dataframe(run.table())
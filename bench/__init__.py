@@ -0,0 +1,3 @@
+"""
+Benchmarks for the dashboard data pipelines (run with python -m bench.run).
+"""
@@ -0,0 +1,190 @@
+"""
+Benchmark the page pipelines on synthetic data, without a browser.
+
+    python -m bench.run --rows 10000 1000000 10000000 --repeat 3
+
+For each size this generates synthetic data under bench/data, or reuses the
+files written for the same size and seed by an earlier run (--regenerate
+rewrites them), then
+times loading (Excel through the app's streaming loader when a workbook was
+written, Parquet always), the one-off
+index/rollup builds, and for HORPT1, HORPT2, Journal RPT1 and Cohort RPT1 the report's
+select (filter) and aggregate stages plus the page's chart preparation, for
+several filter scenarios. Results are
+written as JSON (default bench/results/bench-<UTC time>.json) so runs on
+different machines or commits can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+from bench.synth import write_dataset
+from ncdash.charts import MAX_POINTS, bucket_time, downsample_lines, finest_fitting
+from ncdash.data import ROOT, SOURCES, finalize_frame, read_source
+from ncdash.index import UserTimeIndex
+from ncdash.reports import COHORT_RPT1, HORPT1, HORPT2, JOURNAL_RPT1, FilterSpec, FrameSource
+from ncdash.rollup import build_rollup
+
+
+def timed(fn, repeat):
+    """
+    Run fn repeat times; returns (last result, timing dict in seconds)
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def scenarios(index):
+    """
+    Filter specs exercised for every page: (name, FilterSpec)
+    """
+    first, last = index.span()
+    emails = index.emails
+    one = emails[len(emails) // 2]
+    return [
+        ("admin_all", FilterSpec.build(first, last)),
+        ("admin_3_users", FilterSpec.build(first, last, emails=emails[:3])),
+        ("user_full_range", FilterSpec.build(first, last, emails=[one])),
+        ("user_30_days", FilterSpec.build(last - pd.Timedelta(days=30), last, emails=[one])),
+    ]
+
+
+def chart_horpt1(result):
+    return finest_fitting(result.granularities())
+
+
+def chart_horpt2(result):
+    if result is None:
+        return None
+    return (downsample_lines(result.grouped, "Date", "Nrating", color="Indicator"),
+            downsample_lines(result.grouped, "Date", "Compscore", color="Indicator"))
+
+
+def chart_journal(result):
+    if result is None:
+        return None
+    grouped = result.grouped
+    return (bucket_time(grouped[["Date", "n_Place", "Count", "SumMin"]], "Date",
+                        {"Count": "sum", "SumMin": "sum"}, group_col="n_Place"),
+            result.grid.cells(result.grid.level_for(MAX_POINTS)),
+            result.places.top(10))
+
+
+def chart_cohort(result):
+    if result is None:
+        return None
+    # The page shows one user's row against one precomputed histogram
+    return result.users.join(result.percentiles.add_suffix(" pct")), result.distributions
+
+
+# Report plus the chart preparation its page does on the result
+PAGES = {
+    "HORPT1": (HORPT1, chart_horpt1),
+    "HORPT2": (HORPT2, chart_horpt2),
+    "JournalRPT1": (JOURNAL_RPT1, chart_journal),
+    "CohortRPT1": (COHORT_RPT1, chart_cohort),
+}
+
+
+def load_source(name, paths, repeat):
+    """
+    Time loading one source; returns (frame, records)
+    """
+    records = []
+    if paths["excel"]:
+        # The app's loader: streamed, projected to the used columns, then typed
+        excel, timing = timed(lambda: finalize_frame(name, read_source(name, path=paths["excel"])), repeat)
+        records.append({"source": name, "stage": "load_excel", **timing})
+        # A single user's rows, filtered during the scan
+        email = excel["User email"].iloc[0] if len(excel) else None
+        _, timing = timed(lambda: read_source(name, path=paths["excel"], emails=[email]), repeat)
+        records.append({"source": name, "stage": "load_excel_user", **timing})
+    frame, timing = timed(lambda: finalize_frame(name, pd.read_parquet(paths["parquet"])), repeat)
+    records.append({"source": name, "stage": "load_parquet", **timing})
+    return frame, records
+
+
+def run_size(rows, data_dir, repeat, excel_max, reuse=True):
+    paths = write_dataset(rows, data_dir, excel_max=excel_max, reuse=reuse)
+    records = []
+    frames = {}
+    for name in SOURCES:
+        frames[name], load_records = load_source(name, paths[name], repeat)
+        records += load_records
+        records.append({"source": name, "stage": "frame_mb",
+                        "value": frames[name].memory_usage(deep=True).sum() / 1e6})
+
+    indexes = {}
+    for name, frame in frames.items():
+        indexes[name], timing = timed(lambda: UserTimeIndex(frame), repeat)
+        records.append({"source": name, "stage": "build_index", **timing})
+    rollup, timing = timed(lambda: build_rollup(frames["checkins"]), repeat)
+    records.append({"source": "checkins", "stage": "build_rollup", **timing})
+    source = FrameSource(checkins=frames["checkins"], journal=frames["journal"], rollup=rollup)
+
+    for page, (report, chart) in PAGES.items():
+        for scenario, spec in scenarios(getattr(source, report.source_name)):
+            selection, t_filter = timed(lambda: report.select(source, spec), repeat)
+            result, t_aggregate = timed(lambda: report.aggregate(selection), repeat)
+            _, t_chart = timed(lambda: chart(result), repeat)
+            for stage, timing in (("filter", t_filter), ("aggregate", t_aggregate), ("chart", t_chart)):
+                records.append({"page": page, "scenario": scenario, "stage": stage, **timing})
+    return [{"rows": rows, **record} for record in records]
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard page pipelines")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--excel-max", type=int, default=100_000,
+                        help="largest size that also gets (and times) an Excel workbook")
+    parser.add_argument("--data", default=os.path.join(ROOT, "bench", "data"))
+    parser.add_argument("--out", default=None, help="results JSON path")
+    parser.add_argument("--regenerate", action="store_true",
+                        help="rewrite the synthetic data even when files for the size exist")
+    args = parser.parse_args(argv)
+
+    results = {"meta": metadata(), "results": []}
+    for rows in args.rows:
+        print(f"benchmarking {rows:,} rows ...", flush=True)
+        results["results"] += run_size(rows, args.data, args.repeat, args.excel_max, reuse=not args.regenerate)
+
+    out = args.out or os.path.join(ROOT, "bench", "results",
+                                   f"bench-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Synthetic check-in and journal data with the production sheet schemas.
+
+    python -m bench.synth --rows 10000 --out bench/data
+
+writes NHO-check-in-chart.xlsx / NC-Journal-Data.xlsx (same sheet names and
+header layout as the real workbooks) plus Parquet copies. Excel caps a sheet
+at 1,048,576 rows and writing large workbooks is slow, so above --excel-max
+rows only the Parquet files are written. The data is a function of the row
+count and seed, so files already written for them are reused unless
+--regenerate is given.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from ncdash.data import SOURCES
+
+INDICATORS = [
+    "Awareness", "Calmness", "Clarity", "Confidence", "Empathy", "Endurance", "Esteem",
+    "Focus", "Happiness", "Memory", "Mood", "Patience", "Positivity", "Resilience", "Sleep",
+]
+CHECKINS_PER_SESSION = 3
+START = pd.Timestamp("2024-01-01")
+SPAN_SECONDS = 2 * 365 * 24 * 3600
+
+
+def _users(count):
+    ids = np.arange(count)
+    return pd.Series([f"user{i:05d}@example.com" for i in ids]), pd.Series([f"user_{i}" for i in ids])
+
+
+def make_checkins(rows, seed=0):
+    """
+    Check-ins in 3-indicator sessions, like sheet 00-HO-Data-Prime-no-link
+    """
+    rng = np.random.default_rng(seed)
+    sessions = max(1, rows // CHECKINS_PER_SESSION)
+    emails, names = _users(max(10, rows // 1000))
+
+    user = rng.integers(0, len(emails), sessions)
+    stamp = START + pd.to_timedelta(rng.integers(0, SPAN_SECONDS, sessions), unit="s")
+    stamp = pd.DatetimeIndex(stamp)
+    sess6 = np.asarray(stamp.day * 10000 + stamp.minute * 100 + stamp.second, dtype=np.int64)
+    session_id = (
+        pd.Series(user).map("{:05d}".format).to_numpy().astype(object)
+        + stamp.strftime("%Y%m%d%H%M%S").to_numpy().astype(object)
+    )
+
+    repeat = np.repeat(np.arange(sessions), CHECKINS_PER_SESSION)[:rows]
+    n = len(repeat)
+    rating = rng.integers(1, 6, n)
+    return pd.DataFrame({
+        "User Name": names.to_numpy()[user[repeat]],
+        "Timestamp": stamp[repeat],
+        "Indicator": np.asarray(INDICATORS, dtype=object)[rng.integers(0, len(INDICATORS), n)],
+        "Rating": rating,
+        "composite_score": np.round(1.5 + rating * 0.2 + rng.random(n) * 0.5, 6),
+        "User email": emails.to_numpy()[user[repeat]],
+        "Session id": session_id[repeat],
+        "sess6digit": np.asarray(sess6)[repeat],
+    })
+
+
+def make_journal(rows, seed=0):
+    """
+    Nature visits, like sheet Journal-Data-wo-link
+    """
+    rng = np.random.default_rng(seed + 1)
+    emails, names = _users(max(10, rows // 100))
+    places = max(50, rows // 200)
+    place_lat = 37.2 + rng.random(places) * 1.0
+    place_lon = -122.6 + rng.random(places) * 1.0
+    place_names = np.array([f"Park {i}" for i in range(places)], dtype=object)
+
+    user = rng.integers(0, len(emails), rows)
+    place = rng.integers(0, places, rows)
+    duration = rng.integers(5, 181, rows)
+    stamp = START + pd.to_timedelta(rng.integers(0, SPAN_SECONDS, rows), unit="s")
+    return pd.DataFrame({
+        "User Name": names.to_numpy()[user],
+        "User email": emails.to_numpy()[user],
+        "Timestamp": stamp,
+        "n_Duration": duration,
+        "End Date Time": stamp + pd.to_timedelta(duration, unit="m"),
+        "n_Name": place_names[place],
+        "City": "San Francisco",
+        "State": "CA",
+        "Zip": 94100 + place % 100,
+        "Country": "US",
+        "n_Place": place_names[place] + ", San Francisco CA US",
+        "n_Lati": np.round(place_lat[place], 2),
+        "n_Long": np.round(place_lon[place], 2),
+        "n_park_nbr": place,
+    })
+
+
+GENERATORS = {"checkins": make_checkins, "journal": make_journal}
+
+
+def _write(path, write):
+    # Written under a temporary name, so an interrupted run leaves nothing to reuse
+    tmp = f"{path}.{os.getpid()}.tmp{os.path.splitext(path)[1]}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def write_dataset(rows, out_dir, excel_max=100_000, seed=0, reuse=True):
+    """
+    Write both synthetic sources, keeping files already written for the same
+    rows and seed when reuse is True; returns {name: {"parquet": path, "excel": path or None}}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for name, make in GENERATORS.items():
+        spec = SOURCES[name]
+        base = os.path.join(out_dir, f"{name}-{rows}-seed{seed}")
+        parquet = f"{base}.parquet"
+        excel = f"{base}.xlsx" if rows <= excel_max else None
+        missing = [path for path in (parquet, excel) if path and not (reuse and os.path.exists(path))]
+        if missing:
+            df = make(rows, seed)
+            if parquet in missing:
+                _write(parquet, lambda path: df.to_parquet(path, index=False))
+            if excel in missing:
+                def write_excel(path):
+                    with pd.ExcelWriter(path) as writer:
+                        # header=1 in SOURCES means one title row above the header
+                        df.to_excel(writer, sheet_name=spec["sheet"], startrow=spec["header"], index=False)
+                _write(excel, write_excel)
+        written[name] = {"parquet": parquet, "excel": excel}
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic dashboard data")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000])
+    parser.add_argument("--out", default=os.path.join("bench", "data"))
+    parser.add_argument("--excel-max", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--regenerate", action="store_true", help="rewrite files that already exist")
+    args = parser.parse_args(argv)
+    for rows in args.rows:
+        for name, paths in write_dataset(rows, args.out, args.excel_max, args.seed,
+                                         reuse=not args.regenerate).items():
+            print(f"{name} {rows}: {paths}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Shared data and report helpers for the Nature Counter dashboard pages.
+
+The data helpers are imported on first use, so importing a light submodule
+(e.g. ncdash.permissions on the login page) does not load the data layer.
+"""
+import importlib
+
+__all__ = ["load_checkins", "load_journal", "load_sheet"]
+
+
+def __getattr__(name):
+    if name in __all__:
+        return getattr(importlib.import_module("ncdash.data"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,143 @@
+"""
+Server-side reduction of chart data before it is sent to the browser.
+
+Every chart gets a point budget (NC_CHART_MAX_POINTS) and a payload budget in
+bytes (NC_CHART_MAX_BYTES). Frames that fit are passed through unchanged;
+larger ones are reduced:
+
+    bucket_time      re-aggregates to the finest of day/week/month/quarter/year
+                     buckets that fits (bar charts of additive measures)
+    finest_fitting   picks the finest of several precomputed granularities that
+                     fits (distinct counts, which cannot be summed into coarser
+                     buckets)
+    downsample_lines keeps the visually significant points of each series with
+                     Largest-Triangle-Three-Buckets (line and scatter charts)
+
+Map points are aggregated on a zoomable grid instead (ncdash/geo.py).
+
+Each reducer returns (frame, note); note is None when nothing was reduced and
+otherwise a short message the page shows under the chart.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = int(os.environ.get("NC_CHART_MAX_POINTS", 5000))
+MAX_BYTES = int(os.environ.get("NC_CHART_MAX_BYTES", 1_000_000))
+
+# Bucket sizes tried in order: (label, pandas period alias)
+TIME_BUCKETS = [("weekly", "W"), ("monthly", "M"), ("quarterly", "Q"), ("yearly", "Y")]
+
+
+def row_bytes(df, sample=200):
+    """
+    Approximate JSON payload per row, measured on a sample of the frame
+    """
+    if df.empty:
+        return 1
+    head = df.head(sample)
+    return max(1, len(head.to_json(orient="records", date_format="iso")) // len(head))
+
+
+def point_budget(df, max_points=None, max_bytes=None):
+    """
+    Number of rows of df that fits both the point and the byte budget
+    """
+    max_points = MAX_POINTS if max_points is None else max_points
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    return max(1, min(max_points, max_bytes // row_bytes(df)))
+
+
+def reduction_note(before, after, how):
+    return f"⚡ Downsampled for display: {before:,} → {after:,} points ({how})."
+
+
+def bucket_time(df, date_col, aggs, group_col=None, max_points=None, max_bytes=None):
+    """
+    Re-aggregate df to coarser time buckets until it fits the budget.
+
+    aggs maps value columns to a pandas aggregation ("sum", "mean", ...).
+    Bucketed rows are labelled with the bucket's start date.
+    """
+    budget = point_budget(df, max_points, max_bytes)
+    if len(df) <= budget:
+        return df, None
+
+    dates = pd.to_datetime(df[date_col])
+    groups = df[group_col].nunique() if group_col else 1
+    for label, alias in TIME_BUCKETS:
+        periods = dates.dt.to_period(alias)
+        if periods.nunique() * groups <= budget or alias == TIME_BUCKETS[-1][1]:
+            break
+
+    keys = [periods.dt.start_time.rename(date_col)]
+    if group_col:
+        keys.append(df[group_col])
+    reduced = df.groupby(keys, observed=True).agg(aggs).reset_index()
+    return reduced, reduction_note(len(df), len(reduced), f"{label} buckets")
+
+
+def finest_fitting(frames, max_points=None, max_bytes=None):
+    """
+    First of [(label, frame), ...], ordered finest first, that fits the
+    budget (the last one when none does)
+    """
+    for label, frame in frames:
+        if len(frame) <= point_budget(frame, max_points, max_bytes):
+            break
+    first = frames[0][1]
+    if frame is first:
+        return frame, None
+    return frame, reduction_note(len(first), len(frame), f"{label} counts")
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Positions of the points kept by Largest-Triangle-Three-Buckets.
+
+    x must be sorted; the first and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    every = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype=np.intp)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample_lines(df, x, y, color=None, max_points=None, max_bytes=None):
+    """
+    LTTB-downsample each series (one per color value) to share the budget
+    """
+    budget = point_budget(df, max_points, max_bytes)
+    if len(df) <= budget:
+        return df, None
+
+    data = df.dropna(subset=[y])
+    series = [data] if color is None else [part for _, part in data.groupby(color, observed=True)]
+    per_series = max(3, budget // max(1, len(series)))
+
+    parts = []
+    for part in series:
+        part = part.sort_values(x)
+        xs = part[x].to_numpy()
+        if not np.issubdtype(xs.dtype, np.number):
+            xs = pd.to_datetime(part[x]).to_numpy().astype("datetime64[ns]").astype(np.int64)
+        parts.append(part.iloc[lttb_indices(xs, part[y].to_numpy(), per_series)])
+    reduced = pd.concat(parts, ignore_index=True)
+    return reduced, reduction_note(len(df), len(reduced), "LTTB per series")
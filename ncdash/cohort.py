@@ -0,0 +1,117 @@
+"""
+Per-user statistics for a whole cohort, and where each user stands in it.
+
+Every user's metrics are computed in one vectorized pass over the check-in
+rollup and the journal rows (integer user codes and np.bincount, no groupby
+per user), then ranked against the population:
+
+    Sessions       distinct Session id check-ins
+    Check-ins      check-in rows
+    Avg rating     mean Rating over the user's check-ins
+    Avg score      mean composite_score over the user's check-ins
+    Nature minutes summed n_Duration
+    Visits         journal entries
+    Places         distinct n_Place visited
+
+Users without check-ins (or journal entries) in the range count zero for the
+additive metrics and have no average rating/score.
+"""
+import numpy as np
+import pandas as pd
+
+from ncdash.rollup import set_codes
+from ncdash.timeagg import _codes
+
+METRICS = ["Sessions", "Check-ins", "Avg rating", "Avg score", "Nature minutes", "Visits", "Places"]
+PERCENTILES = [10, 25, 50, 75, 90]
+HIST_BINS = 20
+
+
+def _present(values):
+    # Codes of a column, its distinct values, and the ones that occur
+    codes, uniques = _codes(values)
+    return codes, uniques, [str(v) for v in uniques.take(np.unique(codes[codes >= 0]))]
+
+
+def _recode(codes, uniques, users):
+    # Column codes as positions in users (-1 for missing values); maps the
+    # distinct values once instead of converting every row
+    positions = pd.Index(users).get_indexer([str(v) for v in uniques])
+    if not len(positions):
+        return np.full(len(codes), -1, dtype=np.int64)
+    return np.where(codes >= 0, positions.take(np.maximum(codes, 0)), -1)
+
+
+def _distinct_per_user(user_codes, codes, nusers, nvalues):
+    # Number of distinct value codes per user code
+    keep = (user_codes >= 0) & (codes >= 0)
+    nvalues = max(1, nvalues)
+    pairs = pd.unique(user_codes[keep] * nvalues + codes[keep])
+    return np.bincount(pairs // nvalues, minlength=nusers)
+
+
+def user_stats(rollup, journal):
+    """
+    One row per user (index "User email") with the METRICS columns, from a
+    check-in rollup slice and journal rows
+    """
+    checkin_codes, checkin_users, checkin_present = _present(rollup["User email"])
+    journal_codes, journal_users, journal_present = _present(journal["User email"])
+    users = sorted(set(checkin_present) | set(journal_present))
+    n = len(users)
+
+    user = _recode(checkin_codes, checkin_users, users)
+    valid = user >= 0
+
+    def total(column):
+        return np.bincount(user[valid], weights=rollup[column].to_numpy(dtype=np.float64)[valid], minlength=n)
+
+    rows, session_codes = set_codes(rollup, "Sessions")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_rating = total("Rating_sum") / total("Rating_n")
+        avg_score = total("Score_sum") / total("Score_n")
+
+    visitor = _recode(journal_codes, journal_users, users)
+    seen = visitor >= 0
+    place_codes, places = _codes(journal["n_Place"])
+    minutes = np.nan_to_num(journal["n_Duration"].to_numpy(dtype=np.float64))
+    return pd.DataFrame({
+        "Sessions": _distinct_per_user(user.take(rows), session_codes, n, int(session_codes.max(initial=-1)) + 1),
+        "Check-ins": total("Checkins").astype(np.int64),
+        "Avg rating": avg_rating,
+        "Avg score": avg_score,
+        "Nature minutes": np.bincount(visitor[seen], weights=minutes[seen], minlength=n).round().astype(np.int64),
+        "Visits": np.bincount(visitor[seen], minlength=n),
+        "Places": _distinct_per_user(visitor, place_codes, n, len(places)),
+    }, index=pd.Index(users, name="User email"))
+
+
+def percentile_ranks(stats):
+    """
+    Percentile (0-100) of each user's value among the users that have one
+    """
+    return stats.rank(pct=True).mul(100).round(1)
+
+
+def summary(stats):
+    """
+    Per metric: users with a value, mean, and the PERCENTILES across users
+    """
+    rows = {}
+    for metric in stats.columns:
+        values = stats[metric].dropna().to_numpy(dtype=np.float64)
+        quantiles = np.percentile(values, PERCENTILES) if len(values) else [np.nan] * len(PERCENTILES)
+        rows[metric] = {"Users": len(values), "Mean": values.mean() if len(values) else np.nan,
+                        **{f"P{p}": q for p, q in zip(PERCENTILES, quantiles)}}
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("Metric")
+
+
+def distribution(values, bins=HIST_BINS):
+    """
+    Histogram of one metric across users: Low, High, Users per bin
+    """
+    values = pd.Series(values).dropna().to_numpy(dtype=np.float64)
+    if not len(values):
+        return pd.DataFrame(columns=["Low", "High", "Users"])
+    counts, edges = np.histogram(values, bins=min(bins, max(1, len(np.unique(values)))))
+    return pd.DataFrame({"Low": edges[:-1], "High": edges[1:], "Users": counts})
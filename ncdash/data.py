@@ -0,0 +1,314 @@
+"""
+Shared data access for the report pages.
+
+Each source sheet is parsed from Excel at most once per process. The parsed,
+typed frame is also written to a Parquet cache next to the app so that a
+restarted process reads columnar data instead of re-parsing the workbook.
+
+Only the columns the pages and reports use are loaded; workbooks are
+streamed in chunks (ncdash/stream.py) rather than read whole. Loaded frames
+are compacted (repeated strings as categoricals, numbers downcast to the
+narrowest type that holds them) and shared read-only by all sessions: with
+pandas copy-on-write (always on from pandas 3, the version requirements.txt
+pins), a page that modifies a slice gets its own copy instead of changing the
+shared frame.
+
+Once a sheet has been ingested into the partitioned store (see
+ncdash/ingest.py), it is read from the store instead of the workbook.
+
+In serving mode (NC_SNAPSHOT_DIR, set by ncdash/serve.py for its workers),
+frames are mapped from the current Arrow snapshot (ncdash/snapshot.py) that
+the supervisor publishes, and neither the workbook nor the store is read.
+"""
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ncdash import trace
+from ncdash.stream import read_sheet
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("NC_CACHE_DIR", os.path.join(ROOT, ".cache"))
+STORE_DIR = os.environ.get("NC_STORE_DIR", os.path.join(ROOT, "store"))
+STATE_FILE = "_state.json"
+# Published snapshots to read instead of the sources (serving mode only)
+SNAPSHOT_DIR = os.environ.get("NC_SNAPSHOT_DIR", "")
+
+# Bump when parse_sheet changes so older cache files are not reused
+CACHE_VERSION = 4
+
+# Source workbooks used by the pages, the columns loaded from them, the
+# columns stored as categoricals and the downcast numeric types
+SOURCES = {
+    "checkins": {
+        "path": "NHO-check-in-chart.xlsx",
+        "sheet": "00-HO-Data-Prime-no-link",
+        "header": 0,
+        "columns": ["User Name", "Timestamp", "Indicator", "Rating", "composite_score",
+                    "User email", "Session id", "sess6digit"],
+        "categories": ["User Name", "User email", "Indicator", "Session id"],
+        "dtypes": {"Rating": "int16", "composite_score": "float32", "sess6digit": "int32"},
+    },
+    "journal": {
+        "path": "NC-Journal-Data.xlsx",
+        "sheet": "Journal-Data-wo-link",
+        "header": 1,
+        "columns": ["User Name", "User email", "Timestamp", "n_Duration", "n_Place", "n_Lati", "n_Long"],
+        "categories": ["User Name", "User email", "n_Place"],
+        "dtypes": {"n_Duration": "int32", "n_Lati": "float32", "n_Long": "float32"},
+    },
+}
+
+_lock = threading.Lock()
+_frames = {}  # name -> (mtime_ns, size, digest, frame)
+_snapshots = {}  # name -> (pointer inode, pointer mtime_ns, version, frame)
+
+
+def source_path(name):
+    """
+    Absolute path of the workbook behind a source name
+    """
+    return os.path.join(ROOT, SOURCES[name]["path"])
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    SHA-256 of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_path(name, *parts):
+    """
+    Path inside the partitioned store of an ingested source
+    """
+    return os.path.join(STORE_DIR, name, *parts)
+
+
+def downcast(series, dtype):
+    """
+    series as the narrower numeric dtype, or unchanged if its values do not fit
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu":
+        if series.isna().any():
+            return series
+        info = np.iinfo(dtype)
+        if len(series) and (series.min() < info.min or series.max() > info.max):
+            return series
+    return series.astype(dtype)
+
+
+def finalize_frame(name, df):
+    """
+    Apply the shared typing and row order to a freshly read source frame
+    """
+    spec = SOURCES[name]
+    df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+    for col in spec["categories"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col, dtype in spec["dtypes"].items():
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = downcast(df[col], dtype)
+
+    # Keep each user's rows contiguous and in time order (see ncdash/index.py)
+    return df.sort_values(["User email", "Timestamp"], kind="stable", ignore_index=True)
+
+
+def read_source(name, columns=None, path=None, **filters):
+    """
+    Stream a source workbook (path defaults to the app's copy), keeping the
+    given columns (default: the ones the app uses) and rows matching the
+    emails/begin/end filters of ncdash.stream.iter_sheet_chunks
+    """
+    spec = SOURCES[name]
+    return read_sheet(path or source_path(name), spec["sheet"], spec["header"],
+                      columns=columns or spec["columns"], categories=spec["categories"], **filters)
+
+
+def parse_sheet(name):
+    """
+    Read a source sheet from Excel and apply the shared typing
+    """
+    return finalize_frame(name, read_source(name))
+
+
+def read_store(name):
+    """
+    Read every monthly partition of an ingested source
+    """
+    files = sorted(glob.glob(store_path(name, "month=*", "*.parquet")))
+    if not files:
+        return finalize_frame(name, pd.DataFrame(columns=["User email", "Timestamp"]))
+    columns = SOURCES[name]["columns"]
+    return finalize_frame(name, pd.concat([pd.read_parquet(f, columns=columns) for f in files], ignore_index=True))
+
+
+def _cache_file(name, digest):
+    return os.path.join(CACHE_DIR, f"{name}-v{CACHE_VERSION}-{digest[:16]}.parquet")
+
+
+def _read_cached(name, digest):
+    path = _cache_file(name, digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        return pd.read_parquet(path)
+    except Exception:
+        # Corrupt or unreadable cache file: fall back to the workbook
+        return None
+
+
+def _write_cached(name, digest, df):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _cache_file(name, digest)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp, index=False)
+    except ImportError:
+        # No Parquet engine installed: keep the in-process cache only
+        return
+    os.replace(tmp, path)
+
+    # Drop cache files left behind by older versions of the workbook
+    prefix = f"{name}-"
+    for entry in os.listdir(CACHE_DIR):
+        stale = os.path.join(CACHE_DIR, entry)
+        if entry.startswith(prefix) and entry.endswith(".parquet") and stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def load_sheet(name):
+    """
+    Return the typed frame for a source sheet.
+
+    Rows are sorted by (User email, Timestamp). The frame is shared by every
+    page and session in the process, so callers must treat it as read-only and
+    filter into new frames instead of mutating it.
+    """
+    if SNAPSHOT_DIR:
+        df = _load_snapshot(name)
+        if df is not None:
+            return df
+    return load_from_source(name)
+
+
+def load_from_source(name):
+    """
+    Typed frame read from the ingested store or the workbook, ignoring snapshots
+    """
+    state = store_path(name, STATE_FILE)
+    if os.path.exists(state):
+        return _load_ingested(name, state)
+
+    path = source_path(name)
+    stat = os.stat(path)
+
+    cached = _frames.get(name)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[3]
+
+    with _lock:
+        cached = _frames.get(name)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[3]
+
+        digest = file_digest(path)
+        if cached and cached[2] == digest:
+            # Touched but unchanged: keep the frame, remember the new mtime
+            df = cached[3]
+        else:
+            with trace.span("load.parquet", source=name):
+                df = _read_cached(name, digest)
+            if df is None:
+                with trace.span("load.excel", source=name):
+                    df = parse_sheet(name)
+                _write_cached(name, digest, df)
+
+        _frames[name] = (stat.st_mtime_ns, stat.st_size, digest, df)
+        return df
+
+
+def _load_ingested(name, state):
+    stat = os.stat(state)
+    cached = _frames.get(name)
+    if cached and cached[2] == "store" and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[3]
+
+    with _lock:
+        cached = _frames.get(name)
+        if not (cached and cached[2] == "store" and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size):
+            with trace.span("load.store", source=name):
+                cached = (stat.st_mtime_ns, stat.st_size, "store", read_store(name))
+            _frames[name] = cached
+        return cached[3]
+
+
+def _load_snapshot(name):
+    # Current snapshot frame, or None when none is published yet
+    from ncdash import snapshot  # pyarrow is only required in serving mode
+
+    try:
+        stat = os.stat(snapshot.pointer_path(SNAPSHOT_DIR, name))
+    except FileNotFoundError:
+        return None
+    cached = _snapshots.get(name)
+    if cached and cached[0] == stat.st_ino and cached[1] == stat.st_mtime_ns:
+        return cached[3]
+
+    with _lock:
+        cached = _snapshots.get(name)
+        if not (cached and cached[0] == stat.st_ino and cached[1] == stat.st_mtime_ns):
+            with trace.span("load.snapshot", source=name):
+                version, df = snapshot.read_current(SNAPSHOT_DIR, name)
+            cached = (stat.st_ino, stat.st_mtime_ns, version, df)
+            _snapshots[name] = cached
+        return cached[3]
+
+
+def sheet_version(name):
+    """
+    Token identifying the data load_sheet(name) currently returns
+    (workbook content hash, or the store state for ingested sources; a
+    snapshot carries the token of the data it was published from)
+    """
+    df = load_sheet(name)
+    cached = _snapshots.get(name)
+    if cached is not None and cached[3] is df:
+        return cached[2]
+    return source_version(name)
+
+
+def source_version(name):
+    """
+    sheet_version of the data load_from_source(name) returns
+    """
+    load_from_source(name)
+    mtime, size, digest, _ = _frames[name]
+    return f"store-{mtime}-{size}" if digest == "store" else digest
+
+
+def load_checkins():
+    """
+    Health outcome check-ins (sheet 00-HO-Data-Prime-no-link)
+    """
+    return load_sheet("checkins")
+
+
+def load_journal():
+    """
+    Nature journal entries (sheet Journal-Data-wo-link)
+    """
+    return load_sheet("journal")
@@ -0,0 +1,178 @@
+"""
+Paged table views and chunked file exports of result frames.
+
+Tables are shown one page at a time (NC_TABLE_PAGE_ROWS rows), so a rerun
+serializes only the visible window to the browser instead of the whole frame.
+Full extracts are downloaded as files instead:
+
+    path = export_file(frame, "csv", key)   # or "parquet"
+
+The file is generated in chunks of NC_EXPORT_CHUNK_ROWS rows (CSV text or one
+Parquet row group per chunk) into EXPORT_DIR, named by the digest of the
+result key, so it is written once per data version and filter and reused by
+later downloads. Pages hand export_opener(...) to st.download_button: the file
+is only generated when the user clicks, and the browser fetches it over
+Streamlit's media endpoint rather than the session websocket.
+"""
+import math
+import os
+import threading
+import time
+
+import pandas as pd
+
+from ncdash.data import CACHE_DIR
+from ncdash.results import key_digest
+
+PAGE_ROWS = int(os.environ.get("NC_TABLE_PAGE_ROWS", 500))
+CHUNK_ROWS = int(os.environ.get("NC_EXPORT_CHUNK_ROWS", 50_000))
+EXPORT_DIR = os.environ.get("NC_EXPORT_DIR", os.path.join(CACHE_DIR, "exports"))
+# Export files older than this are removed when a new one is written
+MAX_AGE = float(os.environ.get("NC_EXPORT_MAX_AGE", 24 * 3600))
+
+FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def page_count(nrows, page_rows=PAGE_ROWS):
+    """
+    Number of pages needed for nrows (at least one, for an empty table)
+    """
+    return max(1, math.ceil(nrows / page_rows))
+
+
+def page(frame, number, page_rows=PAGE_ROWS):
+    """
+    Rows of 1-based page number (clamped to the valid pages), as (rows, first, last)
+    with first/last the 1-based positions of the rows shown
+    """
+    number = min(max(1, int(number)), page_count(len(frame), page_rows))
+    start = (number - 1) * page_rows
+    rows = frame.iloc[start:start + page_rows]
+    return rows, start + min(1, len(rows)), start + len(rows)
+
+
+def iter_chunks(frame, chunk_rows=CHUNK_ROWS):
+    """
+    Consecutive row slices of at most chunk_rows rows
+    """
+    for start in range(0, len(frame), chunk_rows):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def plain_cells(frame, sep=None):
+    """
+    frame with list-like cells (e.g. object columns of arrays) as
+    lists, or as strings joined with sep
+    """
+    def plain(value):
+        if not pd.api.types.is_list_like(value):
+            return value
+        values = [str(v) for v in value]
+        return values if sep is None else sep.join(values)
+
+    columns = {
+        col: frame[col].map(plain) for col in frame.columns
+        if frame[col].dtype == object and frame[col].map(pd.api.types.is_list_like).any()
+    }
+    return frame.assign(**columns) if columns else frame
+
+
+def iter_csv(frame, chunk_rows=CHUNK_ROWS):
+    """
+    CSV bytes of frame, one chunk of rows at a time (header in the first chunk)
+    """
+    frame = plain_cells(frame, sep="; ")
+    if not len(frame):
+        yield frame.to_csv(index=False).encode("utf-8")
+        return
+    for number, chunk in enumerate(iter_chunks(frame, chunk_rows)):
+        yield chunk.to_csv(index=False, header=number == 0).encode("utf-8")
+
+
+def _write_csv(frame, path, chunk_rows):
+    with open(path, "wb") as f:
+        for data in iter_csv(frame, chunk_rows):
+            f.write(data)
+
+
+def _write_parquet(frame, path, chunk_rows):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Categories are written as plain values so every row group has the same schema
+    frame = plain_cells(frame)
+    frame = frame.astype({col: frame[col].cat.categories.dtype for col in frame.columns
+                          if isinstance(frame[col].dtype, pd.CategoricalDtype)})
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in iter_chunks(frame, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        if not len(frame):
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+
+
+_WRITERS = {"csv": _write_csv, "parquet": _write_parquet}
+
+
+def export_path(key, fmt):
+    return os.path.join(EXPORT_DIR, f"{key_digest(key)}.{fmt}")
+
+
+def export_file(frame, fmt, key, chunk_rows=CHUNK_ROWS):
+    """
+    Path of frame exported as fmt ("csv" or "parquet"), written in chunks on
+    first use; key identifies the frame's content (a Report.cache_key plus a
+    label for the frame)
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"unsupported export format: {fmt!r}")
+    path = export_path(key, fmt)
+    if os.path.exists(path):
+        return path
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    # Downloads run on their own threads; each writer gets its own temporary file
+    tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        _WRITERS[fmt](frame, tmp, chunk_rows)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    prune(keep=path)
+    return path
+
+
+def export_opener(frame, fmt, key):
+    """
+    Zero-argument callable for st.download_button(data=...): exports on
+    click and returns the file's bytes
+    """
+    def opener():
+        with open(export_file(frame, fmt, key), "rb") as f:
+            return f.read()
+
+    return opener
+
+
+def prune(keep=None, max_age=MAX_AGE):
+    """
+    Remove export files older than max_age seconds; returns the number removed
+    """
+    removed = 0
+    if not os.path.isdir(EXPORT_DIR):
+        return removed
+    cutoff = time.time() - max_age
+    for entry in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, entry)
+        if path == keep or entry.endswith(".tmp"):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
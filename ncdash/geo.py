@@ -0,0 +1,100 @@
+"""
+Grid aggregation of journal locations for the map.
+
+Locations are indexed once on a quadtree-style grid: each point gets integer
+cell coordinates at the finest level (MAX_LEVEL), and the cell at any coarser
+zoom level is found by a bit shift. Points are merged into their finest cell
+up front (point count, coordinate and weight sums), so a grid holds one entry
+per occupied cell rather than per visit. Level z splits longitude into 2**z
+columns and latitude into 2**z rows, so each level up halves the cell size.
+
+The map then renders one marker per occupied cell at the chosen level, sized
+by the cell's total nature minutes, instead of one marker per visit.
+
+    grid = GeoGrid(rows["n_Lati"], rows["n_Long"], rows["n_Duration"])
+    level = grid.level_for(max_cells=2000)
+    cells = grid.cells(level)    # Latitude, Longitude, Points, SumMin, Radius
+"""
+import numpy as np
+import pandas as pd
+
+MAX_LEVEL = 20  # cells of ~20 m x 40 m at the equator
+METERS_PER_DEGREE = 111_320
+
+
+def grid_coords(lat, lon, level=MAX_LEVEL):
+    """
+    Integer (column, row) of each point's cell at a zoom level
+    """
+    n = 1 << level
+    ix = np.floor((np.asarray(lon, dtype=np.float64) + 180.0) / 360.0 * n)
+    iy = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / 180.0 * n)
+    return np.clip(ix, 0, n - 1).astype(np.int64), np.clip(iy, 0, n - 1).astype(np.int64)
+
+
+class GeoGrid:
+    """
+    Weighted points merged into finest-level cells; aggregates to any zoom level
+    """
+
+    def __init__(self, lat, lon, weight=None):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        weight = np.ones(len(lat)) if weight is None else np.asarray(weight, dtype=np.float64)
+        keep = ~(np.isnan(lat) | np.isnan(lon))
+        lat, lon, weight = lat[keep], lon[keep], np.nan_to_num(weight[keep])
+        ix, iy = grid_coords(lat, lon)
+        keys, inverse = np.unique((ix << MAX_LEVEL) | iy, return_inverse=True)
+        self.ix, self.iy = keys >> MAX_LEVEL, keys & ((1 << MAX_LEVEL) - 1)
+        self.points = np.bincount(inverse, minlength=len(keys))
+        self.lat_sum = np.bincount(inverse, weights=lat, minlength=len(keys))
+        self.lon_sum = np.bincount(inverse, weights=lon, minlength=len(keys))
+        self.weight = np.bincount(inverse, weights=weight, minlength=len(keys))
+
+    def __len__(self):
+        # Number of points (visits), not of cells
+        return int(self.points.sum())
+
+    def _keys(self, level):
+        shift = MAX_LEVEL - level
+        return ((self.ix >> shift) << level) | (self.iy >> shift)
+
+    def occupied(self, level):
+        """
+        Number of non-empty cells at a zoom level
+        """
+        return len(np.unique(self._keys(level)))
+
+    def level_for(self, max_cells):
+        """
+        Finest zoom level whose occupied cells fit max_cells (at least level 0)
+        """
+        low, high = 0, MAX_LEVEL
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.occupied(mid) <= max_cells:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def cells(self, level):
+        """
+        One row per occupied cell: mean location, number of points, summed
+        weight (SumMin) and a marker radius in meters scaled by that sum
+        """
+        if not len(self):
+            return pd.DataFrame(columns=["Latitude", "Longitude", "Points", "SumMin", "Radius"])
+        keys, inverse = np.unique(self._keys(level), return_inverse=True)
+        points = np.bincount(inverse, weights=self.points).astype(np.int64)
+        total = np.bincount(inverse, weights=self.weight)
+        # Largest marker spans half a cell; area follows the minutes
+        cell_m = 180.0 / (1 << level) * METERS_PER_DEGREE
+        scale = np.sqrt(total / total.max()) if total.max() > 0 else np.ones(len(keys))
+        return pd.DataFrame({
+            "Latitude": np.bincount(inverse, weights=self.lat_sum) / points,
+            "Longitude": np.bincount(inverse, weights=self.lon_sum) / points,
+            "Points": points,
+            "SumMin": total,
+            "Radius": np.maximum(cell_m / 4 * scale, 50.0),
+        })
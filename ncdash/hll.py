@@ -0,0 +1,91 @@
+"""
+HyperLogLog sketches for approximate distinct counts.
+
+A sketch is a uint8 array of 2**p registers. Sketches of the same precision
+merge with an element-wise max, so per-day sketches can be combined into the
+distinct count of any range of days without touching the underlying values.
+The typical relative error is 1.04 / sqrt(2**p).
+
+Sketches for many groups are kept as one 2-D array (one row per group).
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def precision_for(error):
+    """
+    Smallest precision whose typical relative error is at most error
+    """
+    p = math.ceil(math.log2((1.04 / error) ** 2))
+    return min(MAX_PRECISION, max(MIN_PRECISION, p))
+
+
+def standard_error(p):
+    return 1.04 / math.sqrt(1 << p)
+
+
+def hash_values(values):
+    """
+    Stable 64-bit hashes of the values (strings and numbers hash by their
+    text; integer arrays, such as session codes, by their value)
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+        return pd.util.hash_array(values.astype(np.int64))
+    return pd.util.hash_array(np.asarray(values, dtype=object).astype(str).astype(object))
+
+
+def _bit_length(w):
+    # Vectorised int.bit_length for uint64 arrays
+    w = w.copy()
+    n = np.zeros(w.shape, dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = w >= (np.uint64(1) << np.uint64(shift))
+        n[big] += shift
+        w[big] >>= np.uint64(shift)
+    return n + (w > 0)
+
+
+def sketch_groups(group_ids, values, ngroups, p):
+    """
+    One sketch per group id in 0..ngroups-1, as an (ngroups, 2**p) register array
+    """
+    registers = np.zeros((ngroups, 1 << p), dtype=np.uint8)
+    if len(values) == 0:
+        return registers
+    hashes = hash_values(values)
+    buckets = (hashes >> np.uint64(64 - p)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - p)) - 1)
+    # Position of the leftmost 1-bit in the remaining 64-p bits
+    ranks = (64 - p) - _bit_length(rest) + 1
+    np.maximum.at(registers, (np.asarray(group_ids, dtype=np.intp), buckets), ranks.astype(np.uint8))
+    return registers
+
+
+def merge(registers):
+    """
+    Union of a stack of sketches (rows of a 2-D register array)
+    """
+    return registers.max(axis=0)
+
+
+def estimate(registers):
+    """
+    Distinct-count estimate of a sketch, or of each row of a 2-D register array
+    """
+    registers = np.asarray(registers)
+    m = registers.shape[-1]
+    if m >= 128:
+        alpha = 0.7213 / (1 + 1.079 / m)
+    else:
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+    raw = alpha * m * m / np.power(2.0, -registers.astype(np.float64)).sum(axis=-1)
+    zeros = (registers == 0).sum(axis=-1)
+    # Linear counting is more accurate while many registers are still empty
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where(small, linear, raw)
@@ -0,0 +1,144 @@
+"""
+Row-range index over frames sorted by (User email, time).
+
+Each email owns one contiguous block of rows, so a user's rows are a slice and
+a date window inside that block is found by binary search on the time column.
+Single-user lookups cost O(log N + k) and return slices of the shared frame
+rather than boolean-mask copies.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ncdash.data import load_checkins, load_journal
+
+
+def day_bounds(start_date, end_date):
+    """
+    Half-open [start, end) timestamps covering whole days from start_date to
+    end_date; a missing date leaves that side open (None)
+    """
+    start = None if start_date is None else pd.Timestamp(start_date).normalize()
+    end = None if end_date is None else pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+    return start, end
+
+
+class UserTimeIndex:
+    """
+    Email -> row range index over a frame sorted by ("User email", time_col)
+    """
+
+    def __init__(self, frame, time_col="Timestamp"):
+        self.frame = frame
+        self.time_col = time_col
+        self._times = frame[time_col].to_numpy()
+
+        emails = frame["User email"].astype("category")
+        codes = emails.cat.codes.to_numpy()
+        categories = emails.cat.categories
+        change = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts = np.concatenate(([0], change))
+        stops = np.concatenate((change, [len(codes)]))
+        self.ranges = {
+            categories[codes[start]]: (int(start), int(stop))
+            for start, stop in zip(starts, stops)
+            if len(codes) and codes[start] >= 0
+        }
+
+        # All-user windows search a time-ordered permutation of the rows
+        self._order = np.argsort(self._times, kind="stable")
+        self._sorted_times = self._times[self._order]
+
+    @property
+    def emails(self):
+        """
+        Emails present in the frame, in sorted order
+        """
+        return list(self.ranges)
+
+    def _bounds(self, start, stop, begin, end):
+        times = self._times[start:stop]
+        lo = start if begin is None else start + int(np.searchsorted(times, np.datetime64(begin), "left"))
+        hi = stop if end is None else start + int(np.searchsorted(times, np.datetime64(end), "left"))
+        return lo, max(lo, hi)
+
+    def positions(self, emails=None, begin=None, end=None):
+        """
+        Sorted row positions for the given emails within [begin, end)
+        """
+        if emails is None:
+            lo = 0 if begin is None else int(np.searchsorted(self._sorted_times, np.datetime64(begin), "left"))
+            hi = len(self._times) if end is None else int(np.searchsorted(self._sorted_times, np.datetime64(end), "left"))
+            return np.sort(self._order[lo:max(lo, hi)])
+
+        parts = []
+        for email in sorted(set(emails), key=str):
+            if email in self.ranges:
+                lo, hi = self._bounds(*self.ranges[email], begin, end)
+                parts.append(np.arange(lo, hi))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.intp)
+
+    def rows(self, emails=None, begin=None, end=None):
+        """
+        Rows for the given emails (all when None) with begin <= time < end.
+
+        A single email returns a slice of the shared frame; treat it as read-only.
+        """
+        if emails is None and begin is None and end is None:
+            return self.frame
+        if emails is not None and len(set(emails)) == 1:
+            email = next(iter(emails))
+            if email not in self.ranges:
+                return self.frame.iloc[0:0]
+            lo, hi = self._bounds(*self.ranges[email], begin, end)
+            return self.frame.iloc[lo:hi]
+        return self.frame.iloc[self.positions(emails, begin, end)]
+
+    def span(self, emails=None):
+        """
+        (first, last) time for the given emails, NaT when they have no rows
+        """
+        if emails is None:
+            if not len(self._sorted_times):
+                return pd.NaT, pd.NaT
+            return pd.Timestamp(self._sorted_times[0]), pd.Timestamp(self._sorted_times[-1])
+        blocks = [self.ranges[e] for e in emails if e in self.ranges]
+        if not blocks:
+            return pd.NaT, pd.NaT
+        first = min(self._times[start] for start, _ in blocks)
+        last = max(self._times[stop - 1] for _, stop in blocks)
+        return pd.Timestamp(first), pd.Timestamp(last)
+
+
+_lock = threading.Lock()
+_indexes = {}  # name -> (source frame, index)
+
+
+def cached_index(name, frame, time_col="Timestamp"):
+    """
+    Index for a shared frame, rebuilt only when the frame object changes
+    """
+    cached = _indexes.get(name)
+    if cached and cached[0] is frame:
+        return cached[1]
+    with _lock:
+        cached = _indexes.get(name)
+        if not (cached and cached[0] is frame):
+            cached = (frame, UserTimeIndex(frame, time_col))
+            _indexes[name] = cached
+        return cached[1]
+
+
+def load_checkin_index():
+    """
+    Index over the shared check-in frame
+    """
+    return cached_index("checkins", load_checkins())
+
+
+def load_journal_index():
+    """
+    Index over the shared journal frame
+    """
+    return cached_index("journal", load_journal())
@@ -0,0 +1,224 @@
+"""
+Incremental ingestion of the check-in and journal workbooks.
+
+The workbooks are append-only exports. Each run streams only the rows after the
+last ingested row (openpyxl read-only mode), appends them to monthly Parquet
+partitions under store/<source>/month=YYYY-MM/, and folds them into the derived
+aggregates. Progress is kept in store/<source>/_state.json:
+
+    next_row      first worksheet row not yet ingested
+    prefix_hash   SHA-256 over every worksheet row before next_row
+    high_water    latest Timestamp ingested so far
+    runs          number of runs that appended rows (names the part files)
+
+Each run re-hashes the rows already ingested while streaming past them (the
+read-only reader parses them anyway to reach the new rows). If the hash no
+longer matches, or the sheet now ends before next_row, an earlier row was
+edited, inserted or deleted rather than appended, and the source is rebuilt
+from scratch.
+
+Usage:
+    python -m ncdash.ingest [checkins] [journal] [--full]
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.io.parsers import TextParser
+
+from ncdash.data import SOURCES, STATE_FILE, read_store, source_path, store_path
+from ncdash.rollup import ROLLUP_FILE, build_rollup, merge_rollups, read_rollup, write_rollup
+
+
+def row_bytes(values):
+    """
+    Stable serialization of one worksheet row, fed to the prefix hash
+    """
+    return repr(tuple(values)).encode("utf-8") + b"\n"
+
+
+def read_state(name):
+    path = store_path(name, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_state(name, state):
+    path = store_path(name, STATE_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def read_new_rows(name, state):
+    """
+    Rows appended to the workbook since the state was written.
+
+    Returns (columns, rows, next_row, prefix_hash); rows is None when the
+    workbook no longer matches the state and needs a full rebuild.
+    """
+    spec = SOURCES[name]
+    header_row = spec["header"] + 1
+    first_row = header_row + 1
+    ingested = first_row if state is None else state["next_row"]
+    wb = load_workbook(source_path(name), read_only=True, data_only=True)
+    try:
+        ws = wb[spec["sheet"]]
+        columns = next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True))
+
+        digest = hashlib.sha256()
+        rows = []
+        next_row = first_row
+        blanks = []
+        for number, values in enumerate(ws.iter_rows(min_row=first_row, values_only=True), start=first_row):
+            if number < ingested:
+                digest.update(row_bytes(values))
+                if number == ingested - 1 and digest.hexdigest() != state["prefix_hash"]:
+                    return columns, None, None, None
+                next_row = number + 1
+                continue
+            if all(v is None for v in values):
+                # Trailing blank rows are re-read next time, rows may land
+                # there; blanks followed by new rows become part of the prefix
+                blanks.append(row_bytes(values))
+                continue
+            for blank in blanks:
+                digest.update(blank)
+            blanks = []
+            digest.update(row_bytes(values))
+            rows.append(values)
+            next_row = number + 1
+        if next_row < ingested:
+            # Rows that were ingested are gone: the sheet was truncated
+            return columns, None, None, None
+        return columns, rows, next_row, digest.hexdigest()
+    finally:
+        wb.close()
+
+
+def _drop_orphan_parts(name, runs):
+    # Part files from a run that crashed before its state was written
+    for path in glob.glob(store_path(name, "month=*", "part-*.parquet")):
+        seq = int(os.path.basename(path)[len("part-"):-len(".parquet")])
+        if seq > runs:
+            os.remove(path)
+
+
+def write_partitions(name, new, run):
+    """
+    Append new rows to their monthly partitions as part-<run>.parquet files
+    """
+    months = new["Timestamp"].dt.strftime("%Y-%m").fillna("unknown")
+    for month, part in new.groupby(months):
+        folder = store_path(name, f"month={month}")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"part-{run:06d}.parquet")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        part.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+
+
+def update_checkin_aggregates(new):
+    """
+    Fold newly ingested check-ins into the stored daily rollup
+    """
+    path = store_path("checkins", ROLLUP_FILE)
+    delta = build_rollup(new, values=True)
+    rollup = merge_rollups(read_rollup(path, encode=False), delta) if os.path.exists(path) else delta
+    write_rollup(rollup, path)
+
+
+def rebuild_checkin_aggregates():
+    """
+    Recompute the stored daily rollup from the check-in partitions
+    """
+    write_rollup(build_rollup(read_store("checkins"), values=True), store_path("checkins", ROLLUP_FILE))
+
+
+# Derived aggregates maintained per source: (incremental update, full rebuild, files)
+AGGREGATES = {
+    "checkins": (update_checkin_aggregates, rebuild_checkin_aggregates, [ROLLUP_FILE]),
+}
+
+
+def _repair_aggregates(name):
+    # Aggregates written after the last state file come from a run that did
+    # not finish; rebuild them from the partitions that run committed
+    if name not in AGGREGATES:
+        return
+    _, rebuild, files = AGGREGATES[name]
+    state_mtime = os.path.getmtime(store_path(name, STATE_FILE))
+    for entry in files:
+        path = store_path(name, entry)
+        if os.path.exists(path) and os.path.getmtime(path) > state_mtime:
+            rebuild()
+            return
+
+
+def ingest(name, full=False):
+    """
+    Ingest rows appended to a source workbook; returns the number of new rows
+    """
+    state = None if full else read_state(name)
+    if state is not None and state.get("prefix_hash") is None:
+        # Nothing ingested yet, or a state written before prefix hashing
+        state = None
+    if state is not None:
+        _drop_orphan_parts(name, state["runs"])
+        _repair_aggregates(name)
+
+    columns, rows, next_row, prefix_hash = read_new_rows(name, state)
+    if rows is None:
+        print(f"{name}: workbook was edited, rebuilding from scratch")
+        state = None
+        columns, rows, next_row, prefix_hash = read_new_rows(name, None)
+
+    if state is None:
+        shutil.rmtree(store_path(name), ignore_errors=True)
+        state = {"next_row": None, "prefix_hash": None, "high_water": None, "runs": 0}
+    os.makedirs(store_path(name), exist_ok=True)
+
+    if rows:
+        # Same type inference pd.read_excel applies to worksheet values
+        new = TextParser([columns, *rows], header=0).read()
+        new["Timestamp"] = pd.to_datetime(new["Timestamp"])
+        high_water = new["Timestamp"].max()
+        if state["high_water"] is not None and high_water < pd.Timestamp(state["high_water"]):
+            high_water = pd.Timestamp(state["high_water"])
+
+        run = state["runs"] + 1
+        write_partitions(name, new, run)
+        if name in AGGREGATES:
+            AGGREGATES[name][0](new)
+        state.update(runs=run, high_water=None if pd.isna(high_water) else high_water.isoformat())
+
+    state.update(next_row=next_row, prefix_hash=prefix_hash)
+    write_state(name, state)
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Append new workbook rows to the partitioned store")
+    parser.add_argument("sources", nargs="*", help=f"sources to ingest: {', '.join(SOURCES)} (default: all)")
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch instead of appending")
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.sources) - set(SOURCES))
+    if unknown:
+        parser.error(f"unknown sources: {', '.join(unknown)}")
+
+    for name in args.sources or SOURCES:
+        added = ingest(name, full=args.full)
+        state = read_state(name)
+        print(f"{name}: {added} new rows, high water mark {state['high_water']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Per-session memoization of filter results for the report pages.
+
+A page keys its report result by (report, user, data version, date range,
+selected emails/indicators), see Report.cache_key in ncdash/reports.py. Interactions that do not change the
+filters, such as the Journal Top-N slider or toggling back to an earlier date
+range, are served from the cache instead of regrouping the data.
+"""
+import dataclasses
+import sys
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+SESSION_KEY = "ncdash_memo"
+MAX_ENTRIES = 32
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def _column_nbytes(values):
+    # Categoricals are charged their codes only: the categories are shared
+    # with the frame the values were selected from (e.g. every Session id of
+    # the shared check-in frame), not held by the cached value
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return int(values.array.codes.nbytes)
+    return int(values.memory_usage(deep=True, index=False) if isinstance(values, pd.Series)
+               else values.memory_usage(deep=True))
+
+
+def value_nbytes(value):
+    """
+    Approximate memory held by a cached value
+    """
+    if isinstance(value, pd.DataFrame):
+        return _column_nbytes(value.index) + sum(_column_nbytes(value[col]) for col in value.columns)
+    if isinstance(value, pd.Series):
+        return _column_nbytes(value.index) + _column_nbytes(value)
+    if isinstance(value, pd.Index):
+        return _column_nbytes(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(value_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_nbytes(v) for v in value.values())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if dataclasses.is_dataclass(value):
+        return sys.getsizeof(value) + sum(value_nbytes(getattr(value, f.name)) for f in dataclasses.fields(value))
+    if hasattr(value, "__dict__"):
+        return sys.getsizeof(value) + sum(value_nbytes(v) for v in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by entry count and approximate bytes
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        size = value_nbytes(value)
+        if size > self.max_bytes:
+            # Larger than the whole budget: do not cache it at all
+            return
+        self._entries[key] = (value, size)
+        self.nbytes += size
+        while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """
+        Cached value for key, calling compute() and storing the result on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self):
+        s = self.stats()
+        return (
+            f"Filter cache: {s['hits']} hits / {s['misses']} misses "
+            f"({s['hit_rate']:.0%}), {s['entries']} entries, {s['bytes'] / 1e6:.1f} MB"
+        )
+
+
+def session_cache(session_state):
+    """
+    The LRU cache stored in a Streamlit session (created on first use)
+    """
+    if SESSION_KEY not in session_state:
+        session_state[SESSION_KEY] = LRUCache()
+    return session_state[SESSION_KEY]
@@ -0,0 +1,270 @@
+"""
+In-process permissions store for the login page.
+
+Permission records are held in a dict keyed by normalized email, so a login is
+a single lookup. Fetches from the Google Sheets API never run on the script
+thread: a worker thread fetches (retrying with backoff) and swaps the new
+records in, while logins keep answering from the current copy
+(stale-while-revalidate).
+
+Every successful fetch is also written to a local snapshot file. A freshly
+started process serves logins from that last-known-good snapshot right away
+and refreshes it in the background; only a process with neither a snapshot
+nor a completed fetch makes a login wait, and then for at most
+FETCH_TIMEOUT seconds. The snapshot records the source it was fetched from
+(e.g. the sheet id) and is ignored by a store reading from another source.
+
+The process has one store, shared_store(secrets), which the login page and
+the process warm-up (ncdash/warmup.py) both use, so a worker starts fetching
+permissions before its first page request.
+"""
+import csv
+import json
+import os
+import threading
+import time
+
+from ncdash import trace
+
+REFRESH_SECONDS = 300
+FETCH_TIMEOUT = float(os.environ.get("NC_PERMISSIONS_TIMEOUT", 10))
+# Pauses between fetch attempts of one refresh, and before the next refresh
+# after all attempts failed (so a rate-limited API is not hammered)
+RETRY_DELAYS = (1, 2, 4)
+RETRY_AFTER_FAILURE = 60
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_PATH = os.environ.get(
+    "NC_PERMISSIONS_SNAPSHOT",
+    os.path.join(os.environ.get("NC_CACHE_DIR", os.path.join(_ROOT, ".cache")), "permissions-snapshot.json"),
+)
+_lock = threading.Lock()
+_shared = {}  # "store" / "sheets" -> the process-wide store and Sheets client
+
+
+def normalize_email(email):
+    """
+    Lowercase, stripped form used for every email comparison
+    """
+    return str(email).strip().lower()
+
+
+def build_user_map(records):
+    """
+    Map normalized email -> permission record; the first row for an email wins
+    """
+    users = {}
+    for record in records:
+        email = normalize_email(record.get("email", ""))
+        if email and email not in users:
+            users[email] = {**record, "email": email}
+    return users
+
+
+def read_local_permissions(path):
+    """
+    Permission records from a local CSV or JSON file (offline stand-in for the sheet)
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def read_snapshot(path, origin=None):
+    """
+    Records saved by write_snapshot for the same origin, or None when there is
+    no usable snapshot
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("origin") != origin:
+            return None
+        return saved["records"]
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def write_snapshot(path, records, origin=None):
+    """
+    Atomically replace the snapshot (readable by the owner only), recording
+    the origin the records were fetched from
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": time.time(), "origin": origin, "records": records}, f, default=str)
+    os.replace(tmp, path)
+
+
+class PermissionsStore:
+    """
+    Email -> permission record map, refreshed on a worker thread.
+
+    fetch is a zero-argument callable returning a list of record dicts. It runs
+    on a worker thread, so it must not call Streamlit UI functions. snapshot is
+    the last-known-good file (None to disable it); origin names what fetch
+    reads (e.g. the sheet id), and a snapshot saved from another origin is not used.
+    """
+
+    def __init__(self, fetch, ttl=REFRESH_SECONDS, snapshot=SNAPSHOT_PATH, timeout=FETCH_TIMEOUT,
+                 retry_delays=RETRY_DELAYS, origin=None):
+        self._fetch = fetch
+        self._origin = origin
+        self._ttl = ttl
+        self._snapshot = snapshot
+        self._timeout = timeout
+        self._retry_delays = retry_delays
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._done = threading.Event()
+        self._next_refresh = 0.0  # monotonic time of the next background refresh
+        self.last_error = None
+        self.source = None  # "snapshot" or "live" once records are loaded
+
+        records = read_snapshot(snapshot, origin) if snapshot else None
+        self._users = build_user_map(records) if records else {}
+        if self._users:
+            self.source = "snapshot"
+
+    def refresh(self):
+        """
+        Fetch records now (retrying with backoff) and swap them in; on failure
+        keep the previous copy
+        """
+        for attempt, delay in enumerate((0, *self._retry_delays)):
+            time.sleep(delay)
+            try:
+                with trace.span("permissions.fetch", attempt=attempt):
+                    records = list(self._fetch())
+                users = build_user_map(records)
+            except Exception as e:
+                self.last_error = e
+                continue
+            self._users = users
+            self.source = "live"
+            self.last_error = None
+            self._next_refresh = time.monotonic() + self._ttl
+            if self._snapshot:
+                try:
+                    write_snapshot(self._snapshot, list(users.values()), self._origin)
+                except OSError:
+                    # The snapshot only speeds up cold starts
+                    pass
+            return True
+        self._next_refresh = time.monotonic() + min(self._ttl, RETRY_AFTER_FAILURE)
+        return False
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+            self._done.set()
+
+    def _start_refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._done.clear()
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def prefetch(self):
+        """
+        Start a background fetch if one is due, without waiting for it
+        """
+        if time.monotonic() >= self._next_refresh:
+            self._start_refresh()
+
+    def users(self):
+        """
+        Current email -> record map.
+
+        Never blocks on the API while any copy (live or snapshot) is loaded;
+        with none, waits up to the timeout for the first fetch and returns {}
+        if it has not finished.
+        """
+        self.prefetch()
+        if not self._users and self._refreshing:
+            self._done.wait(self._timeout)
+        return self._users
+
+    def lookup(self, email):
+        """
+        Permission record for an email, or None when it is not registered
+        """
+        with trace.span("permissions.lookup"):
+            return self.users().get(normalize_email(email))
+
+
+def local_permissions_path(secrets=None):
+    """
+    Local permissions file configured via NC_PERMISSIONS_FILE or the
+    permissions_file secret, or None to use Google Sheets
+    """
+    path = os.environ.get("NC_PERMISSIONS_FILE")
+    if not path and secrets is not None:
+        try:
+            path = secrets.get("permissions_file")
+        except Exception:
+            # No secrets.toml at all
+            path = None
+    return path or None
+
+
+def sheets_client(credentials):
+    """
+    Google Sheets client for the service account info, authorized once per
+    process. Raises on failure (failures are not cached)
+    """
+    with _lock:
+        if "sheets" not in _shared:
+            # Imported here so the login form renders without the Sheets libraries
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            scope = [
+                "https://spreadsheets.google.com/feeds",
+                "https://www.googleapis.com/auth/drive",
+            ]
+            client = gspread.authorize(Credentials.from_service_account_info(credentials, scopes=scope))
+            # Requests give up instead of hanging the fetch thread
+            client.set_timeout(FETCH_TIMEOUT)
+            _shared["sheets"] = client
+        return _shared["sheets"]
+
+
+def fetch_sheet_permissions(sheet_id, credentials):
+    """
+    Permission records from the first worksheet of a Google Sheet (runs on the
+    refresh thread, so no Streamlit UI calls here)
+    """
+    worksheet = sheets_client(credentials).open_by_key(sheet_id).get_worksheet(0)
+    return worksheet.get_all_records()
+
+
+def shared_store(secrets):
+    """
+    The process-wide PermissionsStore, created on first use: from the local
+    CSV/JSON stand-in (local_permissions_path), which is read directly and never
+    snapshotted, or else from the google_sheet_id and google_service_account
+    secrets. Raises when neither is configured (nothing is cached then)
+    """
+    with _lock:
+        if "store" not in _shared:
+            local_path = local_permissions_path(secrets)
+            if local_path:
+                store = PermissionsStore(lambda: read_local_permissions(local_path), snapshot=None)
+            else:
+                # Resolved here, on the caller's thread, not on the fetch thread
+                sheet_id = secrets["google_sheet_id"]
+                credentials = secrets["google_service_account"]
+                store = PermissionsStore(lambda: fetch_sheet_permissions(sheet_id, credentials),
+                                         origin=f"sheet:{sheet_id}")
+            _shared["store"] = store
+        return _shared["store"]
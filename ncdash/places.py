@@ -0,0 +1,167 @@
+"""
+Per-place visit and nature-minute totals for any date range.
+
+The journal is reduced once to one entry per (user, place, day) and per
+(place, day), sorted by that key, with running (prefix) sums of the visit
+counts and n_Duration. The totals of every place over a range of days are then
+two binary searches per place and a subtraction, instead of regrouping the
+journal rows, and the Top-N places come from a heap selection over those
+totals:
+
+    index = PlaceIndex(journal)
+    totals = index.totals(emails=None, begin=begin, end=end)   # all users
+    totals.top(5)      # n_Place, Count, SumMin of the 5 places with most minutes
+
+Rows without a place are left out of the per-place sums, like groupby, but
+total_minutes() covers every row in the range: it comes from a separate
+prefix sum of n_Duration by (user, day) and by day.
+"""
+import heapq
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ncdash import trace
+from ncdash.data import load_journal
+from ncdash.timeagg import _codes
+
+_lock = threading.Lock()
+_cache = {}  # "journal" -> (journal frame, PlaceIndex)
+
+
+class _PrefixTable:
+    """
+    Sorted integer keys with prefix sums of the counts and minutes stored per key
+    """
+
+    def __init__(self, keys, minutes):
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.count_sums = np.concatenate(([0], np.cumsum(np.bincount(inverse, minlength=len(self.keys)))))
+        self.minute_sums = np.concatenate(([0.0], np.cumsum(np.bincount(inverse, weights=minutes,
+                                                                        minlength=len(self.keys)))))
+
+    def range_sums(self, low, high):
+        """
+        (counts, minutes) of the keys in [low, high), element-wise over the bounds
+        """
+        lo = np.searchsorted(self.keys, low, "left")
+        hi = np.searchsorted(self.keys, high, "left")
+        return self.count_sums[hi] - self.count_sums[lo], self.minute_sums[hi] - self.minute_sums[lo]
+
+
+class PlaceTotals:
+    """
+    Visits and summed n_Duration of every place visited in a selection
+    """
+
+    def __init__(self, places, counts, minutes, total_minutes=None):
+        visited = counts > 0
+        self.places = places[visited]
+        self.counts = counts[visited].astype(np.int64)
+        self.minutes = np.rint(minutes[visited]).astype(np.int64)
+        # n_Duration of all rows in the selection, including those without a place
+        self._total_minutes = total_minutes
+
+    def __len__(self):
+        return len(self.places)
+
+    def total_minutes(self):
+        if self._total_minutes is None:
+            return int(self.minutes.sum())
+        return int(np.rint(self._total_minutes))
+
+    def top(self, n):
+        """
+        The n places with the most minutes (ties in place order), as a frame
+        """
+        best = heapq.nlargest(n, range(len(self.places)), key=self.minutes.__getitem__)
+        return pd.DataFrame({
+            "n_Place": self.places.take(best),
+            "Count": self.counts[best],
+            "SumMin": self.minutes[best],
+        })
+
+
+class PlaceIndex:
+    """
+    Prefix sums of journal visits and n_Duration by place and day, per user and
+    over all users, and of n_Duration by day alone
+    """
+
+    def __init__(self, frame):
+        place_codes, self.places = _codes(frame["n_Place"])
+        user_codes, users = _codes(frame["User email"])
+        self.users = {email: code for code, email in enumerate(users)}
+        timestamps = frame["Timestamp"].to_numpy()
+        days = timestamps.astype("datetime64[D]").astype(np.int64)
+        minutes = np.nan_to_num(np.asarray(frame["n_Duration"], dtype=np.float64))
+        # Rows without a date are in no range
+        dated = ~np.isnat(timestamps)
+        place_codes, user_codes, days, minutes = place_codes[dated], user_codes[dated], days[dated], minutes[dated]
+
+        self.nplaces = max(1, len(self.places))
+        self.first_day = int(days.min()) if len(days) else 0
+        # One more day than the span, so an open end maps to a key past every row
+        self.ndays = (int(days.max()) - self.first_day + 2) if len(days) else 1
+        days = days - self.first_day
+        # Range totals of the minutes count every row, with or without a place
+        self.days_overall = _PrefixTable(days, minutes)
+        has_user = user_codes >= 0
+        self.days_by_user = _PrefixTable(user_codes[has_user] * self.ndays + days[has_user], minutes[has_user])
+
+        # Rows without a place or user are left out of the place sums, like groupby
+        keep = (place_codes >= 0) & has_user
+        place_codes, user_codes, days, minutes = place_codes[keep], user_codes[keep], days[keep], minutes[keep]
+        place_days = place_codes * self.ndays + days
+        self.by_user = _PrefixTable(user_codes * (self.nplaces * self.ndays) + place_days, minutes)
+        self.overall = _PrefixTable(place_days, minutes)
+
+    def _day(self, ts, default):
+        if ts is None:
+            return default
+        day = np.datetime64(pd.Timestamp(ts), "D").astype(np.int64) - self.first_day
+        return int(min(max(day, 0), self.ndays))
+
+    def totals(self, emails=None, begin=None, end=None):
+        """
+        PlaceTotals of the given emails (all when None) for days in [begin, end);
+        bounds are day starts, as returned by day_bounds
+        """
+        low_day, high_day = self._day(begin, 0), self._day(end, self.ndays)
+        high_day = max(low_day, high_day)
+        place_base = np.arange(len(self.places), dtype=np.int64) * self.ndays
+        if emails is None:
+            counts, minutes = self.overall.range_sums(place_base + low_day, place_base + high_day)
+            total = self.days_overall.range_sums(low_day, high_day)[1]
+        else:
+            counts = np.zeros(len(self.places), dtype=np.int64)
+            minutes = np.zeros(len(self.places))
+            total = 0.0
+            for email in set(emails):
+                if email not in self.users:
+                    continue
+                code = self.users[email]
+                base = code * (self.nplaces * self.ndays) + place_base
+                user_counts, user_minutes = self.by_user.range_sums(base + low_day, base + high_day)
+                counts += user_counts
+                minutes += user_minutes
+                total += self.days_by_user.range_sums(code * self.ndays + low_day, code * self.ndays + high_day)[1]
+        return PlaceTotals(self.places, counts, minutes, total_minutes=total)
+
+
+def load_place_index():
+    """
+    PlaceIndex of the shared journal frame, rebuilt only when the frame changes
+    """
+    journal = load_journal()
+    cached = _cache.get("journal")
+    if cached and cached[0] is journal:
+        return cached[1]
+    with _lock:
+        cached = _cache.get("journal")
+        if not (cached and cached[0] is journal):
+            with trace.span("load.places"):
+                cached = (journal, PlaceIndex(journal))
+            _cache["journal"] = cached
+        return cached[1]
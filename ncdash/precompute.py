@@ -0,0 +1,112 @@
+"""
+Batch precomputation of every user's default report results.
+
+Non-admin users always land on the same view: their own email over their full
+date range. This job runs HORPT1, HORPT2 and Journal RPT1 for that view for
+every user in the data, plus the admin cohort view over all users, spread over
+a process pool, and writes the results to the ResultStore (ncdash/results.py)
+that the pages read on first render. Run
+it after ingestion, e.g. from cron before the morning logins:
+
+    python -m ncdash.ingest && python -m ncdash.precompute
+
+Making room for the new results only evicts older ones. When this run's
+results alone take more than the store's bound (NC_RESULTS_MAX_MB), the job
+warns, since the pages' own writes would then evict them.
+
+Usage:
+    python -m ncdash.precompute [--workers N]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ncdash.reports import REPORTS, SharedSource
+from ncdash.results import ResultStore
+
+
+def precompute_users(report_name, emails):
+    """
+    Run one report's default view for a batch of users; returns the written paths
+    """
+    report = REPORTS[report_name]
+    source = SharedSource()
+    store = ResultStore()
+    paths = []
+    for email in emails:
+        spec = report.default_spec(source, email)
+        paths.append(store.put(report.cache_key(source, spec), report.run(source, spec), evict=False))
+    return paths
+
+
+def written_bytes(paths):
+    """
+    Total size of the files at paths (ones already removed count as 0)
+    """
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except FileNotFoundError:
+            pass
+    return total
+
+
+def batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def precompute(workers=None):
+    """
+    Precompute all reports for all users; returns {report name: (results
+    written, bytes written)}
+    """
+    workers = workers or os.cpu_count() or 1
+    # Load and index the shared data once up front: forked workers inherit it,
+    # other start methods read the Parquet cache this writes instead of each
+    # worker parsing the workbooks
+    source = SharedSource()
+    for attr in ("checkins", "journal", "rollup"):
+        getattr(source, attr)
+
+    tasks = []
+    for name, report in REPORTS.items():
+        # All-user reports (the admin cohort view) have one default view
+        emails = list(getattr(source, report.source_name).emails) if report.per_user else [None]
+        size = max(1, -(-len(emails) // (workers * 4)))
+        tasks.extend((name, batch) for batch in batches(emails, size))
+
+    written = {name: [] for name in REPORTS}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [(name, pool.submit(precompute_users, name, batch)) for name, batch in tasks]
+        for name, future in futures:
+            written[name].extend(future.result())
+
+    # Enforce the store's size bound once, after the batch, on everything but
+    # this run's results: older ones (e.g. for previous data versions) go first
+    sizes = {name: written_bytes(paths) for name, paths in written.items()}
+    store = ResultStore()
+    store.evict(keep=[path for paths in written.values() for path in paths])
+    total = sum(sizes.values())
+    if total > store.max_bytes:
+        print(f"warning: precomputed results take {total / 1e6:.1f} MB, over the result store's "
+              f"{store.max_bytes / 1e6:.0f} MB bound; raise NC_RESULTS_MAX_MB or pages will evict them")
+    return {name: (len(paths), sizes[name]) for name, paths in written.items()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute each user's default report results")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    counts = precompute(args.workers)
+    for name, (count, size) in counts.items():
+        print(f"{name}: {count} results, {size / 1e6:.1f} MB")
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
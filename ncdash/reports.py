@@ -0,0 +1,417 @@
+"""
+Headless report engine behind the dashboard pages.
+
+Each report takes a data source and a FilterSpec and returns plain result
+frames/values, with no Streamlit calls, so reports can be run in batch,
+cached, benchmarked or parallelised outside a page rerun. The pages only
+collect the filter inputs and render the result.
+
+A report runs in two stages that can be timed separately:
+
+    select(source, spec)  -> Selection   (index slices for the filter)
+    aggregate(selection)  -> result      (None when nothing matched, for the
+                                          reports whose pages stop on empty)
+
+    from ncdash.reports import FrameSource, FilterSpec, HORPT1
+    result = HORPT1.run(FrameSource(checkins=df), FilterSpec(emails=("a@b.com",)))
+"""
+import itertools
+from dataclasses import dataclass
+from typing import Optional
+
+import pandas as pd
+
+from ncdash import cohort, trace
+from ncdash.data import sheet_version
+from ncdash.geo import GeoGrid
+from ncdash.index import UserTimeIndex, day_bounds, load_checkin_index, load_journal_index
+from ncdash.places import PlaceIndex, PlaceTotals, load_place_index
+from ncdash.rollup import (
+    APPROX_MIN_ROWS,
+    DaySketches,
+    build_rollup,
+    filter_rollup,
+    indicator_daily,
+    load_day_sketches,
+    load_rollup_index,
+    mean_scores,
+    session_counts_by,
+    total_sessions,
+)
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+    Filter inputs shared by the reports.
+
+    emails=None means all users; an empty date bound means open-ended.
+    approx allows HyperLogLog estimates for distinct session counts of
+    all-user views (see DaySketches in ncdash/rollup.py).
+    """
+
+    start_date: Optional[object] = None
+    end_date: Optional[object] = None
+    emails: Optional[tuple] = None
+    indicators: Optional[tuple] = None
+    approx: bool = False
+
+    @classmethod
+    def build(cls, start_date=None, end_date=None, emails=None, indicators=None, approx=False):
+        """
+        Spec from page inputs (lists, empty selections) in a canonical, hashable form
+        """
+        return cls(
+            start_date=None if start_date is None else pd.Timestamp(start_date).date(),
+            end_date=None if end_date is None else pd.Timestamp(end_date).date(),
+            emails=tuple(sorted(map(str, emails))) if emails else None,
+            indicators=tuple(sorted(map(str, indicators))) if indicators else None,
+            approx=bool(approx),
+        )
+
+    def bounds(self):
+        """
+        Half-open [begin, end) timestamps covering the whole days of the range
+        """
+        return day_bounds(self.start_date, self.end_date)
+
+    def key(self):
+        return (str(self.start_date), str(self.end_date), self.emails, self.indicators, self.approx)
+
+
+class FrameSource:
+    """
+    Data source over in-memory frames (batch jobs, benchmarks, notebooks)
+    """
+
+    _versions = itertools.count()
+
+    def __init__(self, checkins=None, journal=None, rollup=None):
+        self._checkins = checkins
+        self._journal = journal
+        self._rollup = rollup
+        self._indexes = {}
+        self._version = f"frames-{next(self._versions)}"
+
+    def _index(self, name, build):
+        if name not in self._indexes:
+            self._indexes[name] = build()
+        return self._indexes[name]
+
+    @property
+    def checkins(self):
+        return self._index("checkins", lambda: UserTimeIndex(self._checkins))
+
+    @property
+    def journal(self):
+        return self._index("journal", lambda: UserTimeIndex(self._journal))
+
+    @property
+    def rollup(self):
+        def build():
+            rollup = self._rollup if self._rollup is not None else build_rollup(self.checkins.frame)
+            return UserTimeIndex(rollup, time_col="Date")
+        return self._index("rollup", build)
+
+    @property
+    def places(self):
+        return self._index("places", lambda: PlaceIndex(self.journal.frame))
+
+    def sketches(self, column):
+        return self._index(f"sketches-{column}", lambda: DaySketches.build(self.rollup.frame, column))
+
+    def version(self, name):
+        return self._version
+
+
+class SharedSource:
+    """
+    Data source over the process-wide cached sheets used by the pages
+    """
+
+    @property
+    def checkins(self):
+        return load_checkin_index()
+
+    @property
+    def journal(self):
+        return load_journal_index()
+
+    @property
+    def rollup(self):
+        return load_rollup_index()
+
+    @property
+    def places(self):
+        return load_place_index()
+
+    def sketches(self, column):
+        return load_day_sketches(column)
+
+    def version(self, name):
+        return sheet_version(name)
+
+
+@dataclass
+class Selection:
+    """
+    Rows (raw and/or rollup) matched by a FilterSpec
+    """
+
+    rows: Optional[pd.DataFrame] = None
+    rollup: Optional[pd.DataFrame] = None
+    sketches: Optional[DaySketches] = None
+    places: Optional[PlaceTotals] = None
+    journal: Optional[pd.DataFrame] = None
+
+
+@dataclass
+class Horpt1Result:
+    total_sessions: int
+    daily: pd.DataFrame
+    weekly: pd.Series
+    monthly: pd.Series
+    yearly: pd.Series
+    error: Optional[float] = None  # typical relative error when counts are estimated
+
+    def granularities(self):
+        """
+        [(label, frame)] of the session counts, finest first, each with Date
+        and "Unique Sessions" columns like daily
+        """
+        coarser = [("weekly", self.weekly), ("monthly", self.monthly), ("yearly", self.yearly)]
+        return [("daily", self.daily)] + [
+            (label, series.rename("Unique Sessions").reset_index()) for label, series in coarser
+        ]
+
+
+@dataclass
+class Horpt2Result:
+    total_sessions: int
+    mean_rating: float
+    mean_score: float
+    grouped: pd.DataFrame
+    error: Optional[float] = None  # typical relative error when total_sessions is estimated
+
+
+@dataclass
+class JournalResult:
+    unique_places: int
+    total_minutes: int
+    grouped: pd.DataFrame
+    grid: GeoGrid  # visit locations weighted by n_Duration, for the map
+    places: PlaceTotals  # per-place totals of the range; places.top(n) for the Top-N chart
+
+
+@dataclass
+class CohortResult:
+    users: pd.DataFrame  # one row per user: cohort.METRICS values
+    percentiles: pd.DataFrame  # each user's percentile (0-100) per metric
+    summary: pd.DataFrame  # per metric: users, mean and percentiles across users
+    distributions: dict  # metric -> histogram frame (Low, High, Users)
+
+
+class Report:
+    """
+    A report over one source sheet; subclasses implement select and aggregate
+    """
+
+    # Each user has their own default view (False: one view over all users)
+    per_user = True
+
+    def __init__(self, name, source_name):
+        self.name = name
+        self.source_name = source_name
+
+    def select(self, source, spec):
+        raise NotImplementedError
+
+    def aggregate(self, selection):
+        raise NotImplementedError
+
+    def run(self, source, spec):
+        with trace.span("filter", report=self.name):
+            selection = self.select(source, spec)
+        with trace.span("aggregate", report=self.name):
+            return self.aggregate(selection)
+
+    def cache_key(self, source, spec, user=None):
+        """
+        Key identifying this report's result for a data version and filter
+        """
+        return (self.name, user, source.version(self.source_name), *spec.key())
+
+    def sketches(self, source, spec, rollup, column):
+        """
+        Day sketches for the spec's range when its distinct counts may be
+        estimated: approx is set, the view covers all users and indicators,
+        and the range is large enough (exact counts otherwise)
+        """
+        if not spec.approx or spec.emails or spec.indicators or len(rollup) < APPROX_MIN_ROWS:
+            return None
+        return source.sketches(column).window(*spec.bounds())
+
+    def default_spec(self, source, email):
+        """
+        Filter a non-admin user starts from: their own email over their full date range
+        """
+        first, last = getattr(source, self.source_name).span([email])
+        return FilterSpec.build(first, last, emails=[email])
+
+
+class UniqueSessionsReport(Report):
+    """
+    HORPT1: distinct Session id check-ins by day, week, month and year
+    """
+
+    def select(self, source, spec):
+        rollup = filter_rollup(source.rollup, spec.start_date, spec.end_date, emails=spec.emails)
+        return Selection(rollup=rollup, sketches=self.sketches(source, spec, rollup, "Sessions"))
+
+    def rows(self, source, spec):
+        """
+        Check-in rows matched by spec, for the page's table: an index slice of
+        the shared frame, looked up on each rerun instead of being held in the
+        (memoized and stored) result
+        """
+        return source.checkins.rows(spec.emails, *spec.bounds())
+
+    def aggregate(self, selection):
+        rollup = selection.rollup
+        sketches = selection.sketches
+        if sketches is not None:
+            return Horpt1Result(
+                total_sessions=sketches.total(),
+                daily=sketches.counts("D").rename("Unique Sessions").reset_index(),
+                weekly=sketches.counts("W"),
+                monthly=sketches.counts("ME"),
+                yearly=sketches.counts("YE"),
+                error=sketches.error,
+            )
+        # Day/week/month/year counts in one pass over the rollup
+        counts = session_counts_by(rollup)
+        return Horpt1Result(
+            total_sessions=total_sessions(rollup),
+            daily=counts["D"].rename("Unique Sessions").reset_index(),
+            weekly=counts["W"],
+            monthly=counts["ME"],
+            yearly=counts["YE"],
+        )
+
+
+class AverageScoresReport(Report):
+    """
+    HORPT2: sess6digit sessions and mean Rating/composite_score by date x Indicator
+    """
+
+    def select(self, source, spec):
+        rollup = filter_rollup(source.rollup, spec.start_date, spec.end_date,
+                               emails=spec.emails, indicators=spec.indicators)
+        return Selection(rollup=rollup, sketches=self.sketches(source, spec, rollup, "Sess6"))
+
+    def aggregate(self, selection):
+        rollup = selection.rollup
+        if rollup.empty:
+            return None
+        mean_rating, mean_score = mean_scores(rollup)
+        sketches = selection.sketches
+        # Per date x Indicator counts cover a single day each and stay exact
+        return Horpt2Result(
+            total_sessions=total_sessions(rollup, "Sess6") if sketches is None else sketches.total(),
+            mean_rating=mean_rating,
+            mean_score=mean_score,
+            grouped=indicator_daily(rollup),
+            error=None if sketches is None else sketches.error,
+        )
+
+
+class JournalPlacesReport(Report):
+    """
+    Journal RPT1: visits and nature minutes by date x place
+    """
+
+    def select(self, source, spec):
+        begin, end = spec.bounds()
+        return Selection(
+            rows=source.journal.rows(spec.emails, begin, end),
+            # Range sums over the place index, not a regroup of the rows
+            places=source.places.totals(spec.emails, begin, end),
+        )
+
+    def aggregate(self, selection):
+        rows = selection.rows
+        if rows.empty:
+            return None
+        # Group by 'Date' and 'Place' and count occurrences
+        # if admin -- i think we need to group by email, date, n_place
+        # Dates stay datetime64 (midnight) rather than one Python date object per group
+        grouped = rows.groupby([rows["Timestamp"].dt.normalize(), "n_Place"], observed=True).agg(
+            Count=("n_Place", "size"),
+            SumMin=("n_Duration", "sum"),
+            Latitude=("n_Lati", "mean"),
+            Longitude=("n_Long", "mean"),
+        ).reset_index()
+        # Each group is a single place: the column repeats n_Place (a plain
+        # categorical column) rather than aggregating "unique", which puts a
+        # Categorical holding every place as a category in each cell
+        grouped.insert(3, "Unique_places", grouped["n_Place"])
+        grouped = grouped.sort_values("SumMin", ascending=False).rename(columns={"Timestamp": "Date"})
+        # Coordinates are stored as float32; charts (st.map) need plain floats
+        grouped = grouped.astype({"Latitude": "float64", "Longitude": "float64"})
+        places = selection.places
+        return JournalResult(
+            unique_places=len(places),
+            total_minutes=places.total_minutes(),
+            grouped=grouped,
+            grid=GeoGrid(rows["n_Lati"], rows["n_Long"], rows["n_Duration"]),
+            places=places,
+        )
+
+
+class CohortReport(Report):
+    """
+    Cohort RPT1: per-user check-in and journal metrics for every user in the
+    filter, with percentiles and distributions across them
+    """
+
+    per_user = False
+
+    def cache_key(self, source, spec, user=None):
+        # Built from both sheets
+        return (self.name, user, source.version("checkins"), source.version("journal"), *spec.key())
+
+    def select(self, source, spec):
+        begin, end = spec.bounds()
+        return Selection(
+            rollup=filter_rollup(source.rollup, spec.start_date, spec.end_date,
+                                 emails=spec.emails, indicators=spec.indicators),
+            journal=source.journal.rows(spec.emails, begin, end),
+        )
+
+    def default_spec(self, source, email=None):
+        """
+        Filter the page starts from: all users over the full range of both sheets
+        """
+        spans = [span for span in (source.checkins.span(), source.journal.span()) if not pd.isna(span[0])]
+        if not spans:
+            return FilterSpec()
+        return FilterSpec.build(min(first for first, _ in spans), max(last for _, last in spans))
+
+    def aggregate(self, selection):
+        users = cohort.user_stats(selection.rollup, selection.journal)
+        if users.empty:
+            return None
+        return CohortResult(
+            users=users,
+            percentiles=cohort.percentile_ranks(users),
+            summary=cohort.summary(users),
+            distributions={metric: cohort.distribution(users[metric]) for metric in users.columns},
+        )
+
+
+HORPT1 = UniqueSessionsReport("HORPT1", "checkins")
+HORPT2 = AverageScoresReport("HORPT2", "checkins")
+JOURNAL_RPT1 = JournalPlacesReport("JournalRPT1", "journal")
+COHORT_RPT1 = CohortReport("CohortRPT1", "checkins")
+
+REPORTS = {report.name: report for report in (HORPT1, HORPT2, JOURNAL_RPT1, COHORT_RPT1)}
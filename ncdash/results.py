@@ -0,0 +1,262 @@
+"""
+On-disk store of report results keyed by Report.cache_key.
+
+Keys hold the report, the data version of its sources and the filter spec, so
+a stored result is only returned for the same data and filters, and each file
+is named by the digest of its key. The store is shared by every session,
+process and worker using the same directory, and survives restarts:
+
+  * the pages look a result up before running the report, and write what they
+    compute back (fetch), so a filter computed once is read from disk by
+    later sessions, restarted processes and the other serving workers. The
+    write runs on a background thread, so the page renders without waiting
+    for the pickle to reach disk;
+  * the batch job in ncdash/precompute.py writes each user's default report
+    results ahead of the morning logins.
+
+Files are written to a temporary name and renamed into place, so readers see
+either the whole pickle or none. Reads refresh a file's mtime; when the
+directory grows past NC_RESULTS_MAX_MB the least recently used files are
+evicted (results for older data versions are never read again and go first).
+Hits, misses, writes and evictions are counted per process, see stats().
+
+    python -m ncdash.results            # disk usage of the store
+    python -m ncdash.results --evict   # enforce the size bound now
+"""
+import argparse
+import hashlib
+import os
+import pickle
+import queue
+import threading
+
+from ncdash import trace
+from ncdash.data import CACHE_DIR
+
+RESULTS_DIR = os.environ.get("NC_RESULTS_DIR", os.path.join(CACHE_DIR, "results"))
+MAX_BYTES = int(float(os.environ.get("NC_RESULTS_MAX_MB", 512)) * 1024 * 1024)
+# Bump when the report result classes change, so older pickles are not returned
+RESULT_FORMAT = 4
+# Results waiting for the background writer; when it falls further behind,
+# new results are not stored (the next session recomputes them)
+WRITE_QUEUE = 16
+
+_missing = object()
+_lock = threading.Lock()
+_counts = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+_writes = queue.Queue(maxsize=WRITE_QUEUE)
+_pending = set()  # paths queued or being written
+_writer = None
+
+
+def key_digest(key):
+    """
+    File-name-safe digest of a cache key tuple
+    """
+    return hashlib.sha256(repr((RESULT_FORMAT, key)).encode("utf-8")).hexdigest()[:32]
+
+
+def _count(name, n=1):
+    with _lock:
+        _counts[name] += n
+
+
+def stats():
+    """
+    This process's lookups against the store: hits, misses, writes,
+    evictions, failed reads/writes and the hit rate
+    """
+    with _lock:
+        counts = dict(_counts)
+    lookups = counts["hits"] + counts["misses"]
+    counts["hit_rate"] = counts["hits"] / lookups if lookups else 0.0
+    return counts
+
+
+def _write_queued():
+    while True:
+        store, key, value = _writes.get()
+        path = store.path(key)
+        try:
+            with trace.span("result_store.put"):
+                store.put(key, value)
+        except (OSError, pickle.PicklingError):
+            # A full or read-only disk only costs the next session a recompute
+            _count("errors")
+        finally:
+            with _lock:
+                _pending.discard(path)
+            _writes.task_done()
+
+
+def flush():
+    """
+    Wait until every queued result is written
+    """
+    _writes.join()
+
+
+class ResultStore:
+    """
+    Pickled report results in a directory, one file per key
+    """
+
+    def __init__(self, root=RESULTS_DIR, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.root, f"{key_digest(key)}.pkl")
+
+    def get(self, key, default=None):
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+        except FileNotFoundError:
+            _count("misses")
+            return default
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            _count("errors")
+            _count("misses")
+            return default
+        # Guard against digest collisions and files from another key format
+        if stored_key != key:
+            _count("misses")
+            return default
+        _count("hits")
+        try:
+            # Recently read results are evicted last
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value, evict=True):
+        """
+        Store value for key (atomically replacing any earlier file); evicts
+        the least recently used results when the store is over its size
+        bound, unless evict is False. Returns the path written
+        """
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(key)
+        # Sessions run on threads and workers in processes: each writer has its own temporary file
+        tmp = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        _count("writes")
+        if evict:
+            self.evict(keep=(path,))
+        return path
+
+    def put_later(self, key, value):
+        """
+        Queue value for put() on the background writer thread; returns False
+        when the key is already queued or the queue is full
+        """
+        global _writer
+        path = self.path(key)
+        with _lock:
+            if path in _pending:
+                return False
+            try:
+                _writes.put_nowait((self, key, value))
+            except queue.Full:
+                return False
+            _pending.add(path)
+            if _writer is None or not _writer.is_alive():
+                _writer = threading.Thread(target=_write_queued, name="ncdash-results", daemon=True)
+                _writer.start()
+        return True
+
+    def fetch(self, key, compute):
+        """
+        Stored result for key, or compute() queued for writing to the store
+        when there is none
+        """
+        with trace.span("result_store"):
+            value = self.get(key, _missing)
+        if value is not _missing:
+            return value
+        value = compute()
+        self.put_later(key, value)
+        return value
+
+    def entries(self):
+        """
+        (path, size, mtime) of every stored result, least recently used first
+        """
+        found = []
+        if not os.path.isdir(self.root):
+            return found
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                found.append((entry.path, st.st_size, st.st_mtime))
+        found.sort(key=lambda e: e[2])
+        return found
+
+    def usage(self):
+        """
+        (files, bytes) currently in the store
+        """
+        entries = self.entries()
+        return len(entries), sum(size for _, size, _ in entries)
+
+    def evict(self, keep=()):
+        """
+        Remove least recently used results until the store fits in max_bytes
+        (never the paths in keep, e.g. the file just written); returns the
+        number removed
+        """
+        keep = set(keep)
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                pass
+            total -= size
+            removed += 1
+        _count("evictions", removed)
+        return removed
+
+    def summary(self):
+        s = stats()
+        return (
+            f"Result store: {s['hits']} hits / {s['misses']} misses "
+            f"({s['hit_rate']:.0%}), {s['writes']} written, {s['evictions']} evicted"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the disk usage of the report result store")
+    parser.add_argument("--evict", action="store_true", help="evict least recently used results over the size bound")
+    args = parser.parse_args(argv)
+
+    store = ResultStore()
+    if args.evict:
+        print(f"evicted {store.evict()} results")
+    files, size = store.usage()
+    print(f"{store.root}: {files} results, {size / 1e6:.1f} MB of {store.max_bytes / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
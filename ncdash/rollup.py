@@ -0,0 +1,341 @@
+"""
+Daily rollup of the check-in sheet for the HORPT1/HORPT2 time-series charts.
+
+One row per (User email, Date, Indicator) holding check-in counts, Rating and
+composite_score sums/counts, and the set of distinct session ids seen that
+day. Daily, weekly, monthly and yearly session counts and the average scores
+are answered from these rows instead of regrouping the raw check-ins.
+
+Session sets are Arrow list columns of integer codes (one offsets array plus
+one codes array, not a Python set per row), so slicing the rollup and
+flattening the sets of a slice are vectorized, and distinct counts are numpy
+passes over the codes. The codes of one rollup share one code space; the
+Parquet file maintained by ingestion stores the session values instead
+(values=True), and read_rollup encodes them on load.
+
+For all-user views over long ranges, distinct session counts can instead be
+estimated from per-day HyperLogLog sketches (DaySketches), which merge in
+constant time per day instead of unioning every session id.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ncdash import hll, trace
+from ncdash.data import SNAPSHOT_DIR, STATE_FILE, load_checkins, store_path
+from ncdash.index import cached_index, day_bounds
+from ncdash.timeagg import FREQS, TimeBuckets, _codes, bucket_keys, bucket_labels
+
+ROLLUP_KEYS = ["User email", "Date", "Indicator"]
+
+# Additive measures and the raw column each one is built from
+SUM_COLUMNS = {
+    "Checkins": ("Timestamp", "size"),
+    "Rating_sum": ("Rating", "sum"),
+    "Rating_n": ("Rating", "count"),
+    "Score_sum": ("composite_score", "sum"),
+    "Score_n": ("composite_score", "count"),
+}
+
+# Distinct-session sets; HORPT1 counts "Session id", HORPT2 counts "sess6digit"
+SET_COLUMNS = {
+    "Sessions": "Session id",
+    "Sess6": "sess6digit",
+}
+
+# Rollup maintained by the ingestion command next to the check-in partitions
+ROLLUP_FILE = "_rollup.parquet"
+
+# Approximate distinct counts: on by default for admin views when set, target
+# relative error, and the number of rollup rows below which counts stay exact
+APPROX_DEFAULT = os.environ.get("NC_APPROX_DISTINCT", "") not in ("", "0")
+APPROX_ERROR = float(os.environ.get("NC_DISTINCT_ERROR", 0.02))
+APPROX_MIN_ROWS = int(os.environ.get("NC_APPROX_MIN_ROWS", 20_000))
+
+_lock = threading.Lock()
+_cache = {"source": None, "rollup": None}
+_sketches = {}  # column -> (rollup, precision, DaySketches)
+
+
+def _list_column(lengths, values):
+    # Arrow list column with the given per-row lengths over a flat values array
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    return pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(pa.array(offsets), pa.array(values)))
+
+
+def _group_sets(group_ids, codes, ngroups, uniques=None):
+    # Distinct non-negative codes of each group id 0..ngroups-1, as a list
+    # column of codes (or of their values in uniques), built from one hash
+    # de-duplication and one sort instead of a Python set per group
+    keep = codes >= 0
+    nvalues = max(1, int(codes.max()) + 1) if keep.any() else 1
+    pairs = np.sort(pd.unique(group_ids[keep].astype(np.int64) * nvalues + codes[keep]))
+    groups, codes = np.divmod(pairs, nvalues)
+    lengths = np.bincount(groups, minlength=ngroups)
+    if uniques is None:
+        return _list_column(lengths, codes.astype(np.int32))
+    return _list_column(lengths, np.asarray(uniques.take(codes)))
+
+
+def set_codes(rollup, column):
+    """
+    Every element of a session-set column: (row positions, codes)
+    """
+    if not len(rollup):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    lengths = rollup[column].list.len().to_numpy(dtype=np.int64)
+    codes = rollup[column].list.flatten().to_numpy(dtype=np.int64)
+    return np.repeat(np.arange(len(rollup)), lengths), codes
+
+
+def _set_values(rollup, column):
+    # Rows and session values of a value-form set column
+    if not len(rollup):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+    lengths = rollup[column].list.len().to_numpy(dtype=np.int64)
+    return np.repeat(np.arange(len(rollup)), lengths), rollup[column].list.flatten().to_numpy()
+
+
+def build_rollup(df, values=False):
+    """
+    Aggregate raw check-in rows into the daily rollup table; session sets
+    hold codes, or the session values themselves with values=True (the
+    form merge_rollups and write_rollup take)
+    """
+    # Scores are stored as float32; sum them in float64
+    work = df.assign(Date=df["Timestamp"].dt.normalize(), composite_score=df["composite_score"].astype("float64"))
+    grouped = work.groupby(ROLLUP_KEYS, observed=True, sort=True)
+    rollup = grouped.agg(**SUM_COLUMNS)
+    group_ids = grouped.ngroup().to_numpy()
+    for name, col in SET_COLUMNS.items():
+        codes, uniques = _codes(work[col])
+        rollup[name] = _group_sets(group_ids, codes, len(rollup), uniques if values else None)
+    return rollup.reset_index()
+
+
+def merge_rollups(base, delta):
+    """
+    Fold a rollup of newly appended rows into an existing rollup (both with
+    session values, see build_rollup).
+
+    Keys present in both are combined (sums added, session sets unioned);
+    everything else is carried over unchanged.
+    """
+    combined = pd.concat([base, delta], ignore_index=True)
+    dup = combined.duplicated(ROLLUP_KEYS, keep=False)
+    if dup.any():
+        rows = combined[dup]
+        grouped = rows.groupby(ROLLUP_KEYS, observed=True, sort=True)
+        merged = grouped[list(SUM_COLUMNS)].sum()
+        group_ids = grouped.ngroup().to_numpy()
+        for name in SET_COLUMNS:
+            positions, values = _set_values(rows, name)
+            codes, uniques = _codes(values)
+            merged[name] = _group_sets(group_ids.take(positions), codes, len(merged), uniques)
+        combined = pd.concat([combined[~dup], merged.reset_index()], ignore_index=True)
+
+    for col in ("User email", "Indicator"):
+        combined[col] = combined[col].astype("category")
+    return combined.sort_values(ROLLUP_KEYS, ignore_index=True)
+
+
+def write_rollup(rollup, path):
+    """
+    Store a rollup with session values (see build_rollup) as Parquet
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    rollup.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+
+
+def read_rollup(path, encode=True):
+    """
+    Read a rollup written by write_rollup; session sets are encoded as codes
+    unless encode is False
+    """
+    # Keep the list columns Arrow-backed instead of one numpy array per row
+    rollup = pq.read_table(path).to_pandas(types_mapper=lambda t: pd.ArrowDtype(t) if pa.types.is_list(t) else None)
+    if encode:
+        for name in SET_COLUMNS:
+            rows, values = _set_values(rollup, name)
+            codes, _ = _codes(values)
+            rollup[name] = _list_column(np.bincount(rows, minlength=len(rollup)), codes.astype(np.int32))
+    for col in ("User email", "Indicator"):
+        rollup[col] = rollup[col].astype("category")
+    return rollup
+
+
+def load_checkin_rollup():
+    """
+    Rollup of the shared check-in frame, rebuilt only when the sheet changes.
+
+    When the check-ins have been ingested, the rollup maintained by the
+    ingestion command is read instead of being rebuilt from the raw rows.
+    Serving workers (NC_SNAPSHOT_DIR) always build it from their snapshot
+    frame: the store may already hold rows that the snapshot (and the result
+    keys carrying its version) will only have after the next republish.
+    """
+    df = load_checkins()
+    if _cache["source"] is df:
+        return _cache["rollup"]
+    with _lock:
+        if _cache["source"] is not df:
+            stored = store_path("checkins", ROLLUP_FILE)
+            with trace.span("load.rollup"):
+                if (not SNAPSHOT_DIR and os.path.exists(store_path("checkins", STATE_FILE))
+                        and os.path.exists(stored)):
+                    _cache["rollup"] = read_rollup(stored)
+                else:
+                    _cache["rollup"] = build_rollup(df)
+            _cache["source"] = df
+        return _cache["rollup"]
+
+
+def load_rollup_index():
+    """
+    Email/date index over the shared rollup (rows are sorted by ROLLUP_KEYS)
+    """
+    return cached_index("checkin-rollup", load_checkin_rollup(), time_col="Date")
+
+
+def filter_rollup(index, start_date, end_date, emails=None, indicators=None):
+    """
+    Rollup rows inside a date range, optionally limited to emails/indicators.
+
+    The email/date window is resolved through the rollup index; only the
+    indicator filter is applied as a mask over the resulting slice.
+    """
+    start, end = day_bounds(start_date, end_date)
+    rows = index.rows(emails or None, start, end)
+    if indicators:
+        rows = rows[rows["Indicator"].isin(indicators)]
+    return rows
+
+
+def session_counts_by(rollup, freqs=FREQS, column="Sessions"):
+    """
+    Distinct sessions per day, week, month and year in one pass: {freq: Series}
+
+    "D" holds only days that have check-ins (like groupby on the date); "W",
+    "ME" and "YE" hold every period in the range, like resample.
+    """
+    rows, codes = set_codes(rollup, column)
+    counts = TimeBuckets(rollup["Date"].take(rows), freqs=freqs).distinct(codes)
+    return {freq: series.rename(column) for freq, series in counts.items()}
+
+
+def session_counts(rollup, freq="D", column="Sessions"):
+    """
+    Distinct sessions per period (see session_counts_by)
+    """
+    return session_counts_by(rollup, (freq,), column)[freq]
+
+
+def total_sessions(rollup, column="Sessions"):
+    """
+    Distinct sessions across the whole rollup slice
+    """
+    return len(pd.unique(set_codes(rollup, column)[1]))
+
+
+def mean_scores(rollup):
+    """
+    Average Rating and composite_score over the underlying check-ins
+    """
+    rating = rollup["Rating_sum"].sum() / rollup["Rating_n"].sum()
+    score = rollup["Score_sum"].sum() / rollup["Score_n"].sum()
+    return rating, score
+
+
+def indicator_daily(rollup):
+    """
+    Per date x Indicator distinct sess6digit sessions and average scores (HORPT2)
+    """
+    buckets = TimeBuckets(rollup["Date"], groups=rollup["Indicator"], freqs=("D",))
+    grouped = buckets.sums({col: rollup[col] for col in ("Score_sum", "Score_n", "Rating_sum", "Rating_n")},
+                           name="Indicator")["D"]
+    rows, codes = set_codes(rollup, "Sess6")
+    counts = TimeBuckets(rollup["Date"].take(rows), groups=rollup["Indicator"].take(rows),
+                         freqs=("D",)).distinct(codes, name="Indicator")["D"]
+    return pd.DataFrame({
+        "Count": counts.reindex(grouped.index, fill_value=0),
+        "Compscore": grouped["Score_sum"] / grouped["Score_n"],
+        "Nrating": grouped["Rating_sum"] / grouped["Rating_n"],
+    }).reset_index()
+
+
+class DaySketches:
+    """
+    Per-day HyperLogLog sketches of one session-set column, over all users
+    and indicators of a rollup
+    """
+
+    def __init__(self, dates, registers, column, precision):
+        self.dates = dates
+        self.registers = registers
+        self.column = column
+        self.precision = precision
+        self.error = hll.standard_error(precision)
+
+    @classmethod
+    def build(cls, rollup, column="Sessions", error=APPROX_ERROR):
+        precision = hll.precision_for(error)
+        day_ids, dates = pd.factorize(rollup["Date"], sort=True)
+        rows, codes = set_codes(rollup, column)
+        registers = hll.sketch_groups(day_ids.take(rows), codes, len(dates), precision)
+        return cls(pd.DatetimeIndex(dates, name="Date"), registers, column, precision)
+
+    def window(self, begin=None, end=None):
+        """
+        Sketches of the days in [begin, end) (None leaves that side open)
+        """
+        start = 0 if begin is None else self.dates.searchsorted(begin)
+        stop = len(self.dates) if end is None else self.dates.searchsorted(end)
+        return DaySketches(self.dates[start:stop], self.registers[start:stop], self.column, self.precision)
+
+    def total(self):
+        if not len(self.dates):
+            return 0
+        return int(round(float(hll.estimate(hll.merge(self.registers)))))
+
+    def counts(self, freq="D"):
+        """
+        Estimated distinct sessions per period, shaped like session_counts
+        """
+        if freq == "D":
+            values = np.rint(hll.estimate(self.registers)).astype(int)
+            return pd.Series(values, index=self.dates, name=self.column)
+        if not len(self.dates):
+            return pd.Series([], index=self.dates, name=self.column, dtype=int)
+        # Dates are sorted, so each period's days are one contiguous block
+        keys = bucket_keys(self.dates.to_numpy().astype("datetime64[D]").astype(np.int64), freq)
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        merged = np.maximum.reduceat(self.registers, starts, axis=0)
+        full = np.arange(keys[0], keys[-1] + 1)
+        values = np.zeros(len(full), dtype=int)
+        values[keys[starts] - keys[0]] = np.rint(hll.estimate(merged)).astype(int)
+        index = pd.DatetimeIndex(bucket_labels(full, freq).astype(self.dates.dtype), name="Date")
+        return pd.Series(values, index=index, name=self.column)
+
+
+def load_day_sketches(column="Sessions", error=APPROX_ERROR):
+    """
+    DaySketches of the shared rollup, rebuilt only when the rollup changes
+    """
+    rollup = load_checkin_rollup()
+    precision = hll.precision_for(error)
+    cached = _sketches.get(column)
+    if cached and cached[0] is rollup and cached[1] == precision:
+        return cached[2]
+    with _lock:
+        cached = _sketches.get(column)
+        if not (cached and cached[0] is rollup and cached[1] == precision):
+            with trace.span("load.sketches", column=column):
+                cached = (rollup, precision, DaySketches.build(rollup, column, error))
+            _sketches[column] = cached
+        return cached[2]
@@ -0,0 +1,224 @@
+"""
+Multi-process serving: several Streamlit workers behind a local load balancer.
+
+One Streamlit process runs every session's reruns on one interpreter, so
+concurrent pandas work contends for a single GIL. This supervisor instead
+
+  * loads each source sheet once and publishes it as a memory-mapped snapshot
+    (ncdash/snapshot.py) that all workers share through the OS page cache,
+  * starts N `streamlit run` workers on consecutive local ports with
+    NC_SNAPSHOT_DIR set, restarting any that exit,
+  * accepts browser connections on --port and forwards each one to a worker,
+  * republishes the snapshots every --refresh seconds when a workbook or the
+    ingested store has changed; workers switch on their next page load.
+
+Streamlit keeps a session's state in the worker that serves its websocket,
+and serves media for that session over HTTP from the same worker. New
+browsers go to the worker with the fewest open connections and get an
+`ncworker` cookie; later connections carrying the cookie go to that worker.
+
+Usage:
+    python -m ncdash.serve [--workers N] [--port 8501] [--refresh 60]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+from ncdash import snapshot
+from ncdash.data import CACHE_DIR, ROOT, SOURCES, load_from_source, source_version
+
+APP = "NC-Generic-Login-v1-Secure.py"
+SERVE_DIR = os.environ.get("NC_SERVE_DIR", os.path.join(CACHE_DIR, "serve"))
+COOKIE = "ncworker"
+
+_cookie_re = re.compile(rb"^cookie:.*\b" + COOKIE.encode() + rb"=(\d+)", re.IGNORECASE | re.MULTILINE)
+_MAX_HEAD = 64 * 1024
+
+
+def publish_snapshots(directory=SERVE_DIR):
+    """
+    Publish every source whose data changed since its current snapshot;
+    returns the names published
+    """
+    published = []
+    for name in SOURCES:
+        frame = load_from_source(name)
+        version = source_version(name)
+        if snapshot.current_version(directory, name) != version:
+            snapshot.publish(directory, name, version, frame)
+            published.append(name)
+    return published
+
+
+class Worker:
+    """
+    One `streamlit run` process on a local port
+    """
+
+    def __init__(self, number, port, app, directory):
+        self.number = number
+        self.port = port
+        self.app = app
+        self.directory = directory
+        self.process = None
+        self.connections = 0
+
+    def start(self):
+        env = dict(os.environ, NC_SNAPSHOT_DIR=self.directory)
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "ncdash.warmup", "run", self.app,
+             "--server.port", str(self.port), "--server.address", "127.0.0.1",
+             "--server.headless", "true"],
+            cwd=ROOT, env=env,
+        )
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self):
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+class Balancer:
+    """
+    TCP proxy that keeps each browser on one worker (ncworker cookie)
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._order = itertools.count()
+
+    def choose(self, head):
+        """
+        (worker, assigned): the cookie's worker while it is alive, otherwise the
+        live worker with the fewest open connections
+        """
+        match = _cookie_re.search(head)
+        if match:
+            number = int(match.group(1))
+            if number < len(self.workers) and self.workers[number].alive():
+                return self.workers[number], False
+        live = [w for w in self.workers if w.alive()] or self.workers
+        # Rotate the start so idle workers are used in turn
+        start = next(self._order) % len(live)
+        rotated = live[start:] + live[:start]
+        return min(rotated, key=lambda w: w.connections), True
+
+    async def handle(self, client_reader, client_writer):
+        try:
+            head = await client_reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            client_writer.close()
+            return
+        worker, assigned = self.choose(head)
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", worker.port)
+        except OSError:
+            client_writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            client_writer.close()
+            return
+
+        worker.connections += 1
+        try:
+            upstream_writer.write(head)
+            cookie = f"{COOKIE}={worker.number}; Path=/; HttpOnly; SameSite=Lax" if assigned else None
+            await asyncio.gather(
+                self._pipe(client_reader, upstream_writer),
+                self._pipe(upstream_reader, client_writer, cookie),
+            )
+        finally:
+            worker.connections -= 1
+            for writer in (upstream_writer, client_writer):
+                writer.close()
+
+    @staticmethod
+    async def _pipe(reader, writer, cookie=None):
+        try:
+            if cookie is not None:
+                # Add the cookie to the first response's headers
+                head = await reader.readuntil(b"\r\n\r\n")
+                status, _, rest = head.partition(b"\r\n")
+                writer.write(status + b"\r\nSet-Cookie: " + cookie.encode() + b"\r\n" + rest)
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            if writer.can_write_eof():
+                try:
+                    writer.write_eof()
+                except OSError:
+                    pass
+
+
+async def supervise(workers, refresh, directory):
+    """
+    Restart exited workers and republish changed snapshots
+    """
+    last_refresh = time.monotonic()
+    while True:
+        await asyncio.sleep(1)
+        for worker in workers:
+            if not worker.alive():
+                print(f"worker {worker.number} exited; restarting on port {worker.port}")
+                worker.start()
+        if refresh and time.monotonic() - last_refresh >= refresh:
+            last_refresh = time.monotonic()
+            published = await asyncio.to_thread(publish_snapshots, directory)
+            if published:
+                print(f"published new snapshots: {', '.join(published)}")
+
+
+async def serve(workers, port, refresh, directory):
+    balancer = Balancer(workers)
+    server = await asyncio.start_server(balancer.handle, "0.0.0.0", port, limit=_MAX_HEAD)
+    print(f"serving {len(workers)} workers on port {port}")
+    async with server:
+        await asyncio.gather(server.serve_forever(), supervise(workers, refresh, directory))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the app from several workers sharing data snapshots")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="app workers (default: CPU count)")
+    parser.add_argument("--port", type=int, default=8501, help="public port; workers use the ports after it")
+    parser.add_argument("--refresh", type=float, default=60,
+                        help="seconds between snapshot refresh checks (0 disables)")
+    parser.add_argument("--app", default=APP, help=f"app script (default: {APP})")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    published = publish_snapshots(SERVE_DIR)
+    print(f"snapshots ready in {time.perf_counter() - started:.1f}s"
+          + (f" (published {', '.join(published)})" if published else ""))
+
+    workers = [Worker(n, args.port + 1 + n, args.app, SERVE_DIR) for n in range(max(1, args.workers))]
+    for worker in workers:
+        worker.start()
+    # Stop the workers on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(serve(workers, args.port, args.refresh, SERVE_DIR))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.stop()
+
+
+if __name__ == "__main__":
+    main()
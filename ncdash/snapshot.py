@@ -0,0 +1,106 @@
+"""
+Versioned, memory-mapped snapshots of the loaded source frames.
+
+In serving mode (ncdash/serve.py) one supervisor loads each source sheet and
+publishes it here as an uncompressed Arrow IPC file; every app worker maps the
+file instead of parsing the workbook. Mapped columns are read straight from
+the OS page cache, so N workers share one copy of the data instead of holding
+N parsed frames.
+
+A snapshot is published in two atomic steps: the data file is written under a
+temporary name and renamed to <name>-<version digest>.arrow, then the
+<name>.json pointer naming the current file is replaced. Workers watch the
+pointer and switch to the new file on their next load; files already mapped
+stay valid until the worker drops them, even after they are pruned.
+
+    publish(directory, "journal", version, frame)
+    version, frame = read_current(directory, "journal")
+"""
+import hashlib
+import json
+import os
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+
+def pointer_path(directory, name):
+    """
+    Path of the pointer file naming a source's current snapshot
+    """
+    return os.path.join(directory, f"{name}.json")
+
+
+def _replace(path, write):
+    # Write through a temporary file and rename it over path
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def current_version(directory, name):
+    """
+    Version of a source's current snapshot, or None when there is none
+    """
+    try:
+        with open(pointer_path(directory, name), encoding="utf-8") as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def publish(directory, name, version, frame):
+    """
+    Write frame as the current snapshot of a source and prune older ones;
+    returns the data file path
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256(str(version).encode("utf-8")).hexdigest()[:16]
+    filename = f"{name}-{digest}.arrow"
+    path = os.path.join(directory, filename)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+
+    def write_table(tmp):
+        with pa.OSFile(tmp, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    def write_pointer(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "file": filename}, f)
+
+    _replace(path, write_table)
+    _replace(pointer_path(directory, name), write_pointer)
+
+    # Workers that still map an older file keep their mapping after the unlink
+    for entry in os.listdir(directory):
+        if entry.startswith(f"{name}-") and entry.endswith(".arrow") and entry != filename:
+            try:
+                os.remove(os.path.join(directory, entry))
+            except OSError:
+                pass
+    return path
+
+
+def read_current(directory, name):
+    """
+    (version, frame) of a source's current snapshot, with the frame's columns
+    backed by the memory-mapped file where Arrow allows it
+    """
+    for attempt in range(3):
+        with open(pointer_path(directory, name), encoding="utf-8") as f:
+            pointer = json.load(f)
+        try:
+            source = pa.memory_map(os.path.join(directory, pointer["file"]))
+            break
+        except FileNotFoundError:
+            # Pruned by a publish that replaced the pointer after we read it
+            if attempt == 2:
+                raise
+    table = ipc.open_file(source).read_all()
+    # split_blocks keeps one block per column, so pandas need not consolidate
+    # (copy) the mapped columns
+    return pointer["version"], table.to_pandas(split_blocks=True)
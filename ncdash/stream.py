@@ -0,0 +1,124 @@
+"""
+Streaming, column-projected reader for large worksheets.
+
+pd.read_excel materialises every cell of the sheet before building the frame.
+This reader walks the sheet with openpyxl's read-only row iterator instead and
+keeps memory bounded by the chunk size:
+
+    - only the requested columns are kept (cells right of the last one are
+      not even read),
+    - email and time-range predicates drop rows chunk by chunk, before they
+      are accumulated,
+    - each chunk is typed as it is read (numbers, datetimes, categoricals), so
+      the accumulated result holds compact arrays rather than Python objects.
+
+    from ncdash.stream import read_sheet
+    df = read_sheet("NHO-check-in-chart.xlsx", "00-HO-Data-Prime-no-link",
+                    columns=["Timestamp", "User email", "Session id"],
+                    emails=["a@b.com"], categories=["User email"])
+"""
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+from pandas.io.parsers import TextParser
+
+CHUNK_ROWS = int(os.environ.get("NC_CHUNK_ROWS", 50_000))
+
+
+def _typed_chunk(names, rows, keep, categories, emails, begin, end, email_col, time_col):
+    # Same type inference pd.read_excel applies to worksheet values
+    chunk = TextParser([names, *rows], header=0).read()
+    if time_col in chunk.columns:
+        chunk[time_col] = pd.to_datetime(chunk[time_col])
+
+    mask = None
+    if emails is not None:
+        mask = chunk[email_col].isin(emails)
+    if begin is not None:
+        after = chunk[time_col] >= begin
+        mask = after if mask is None else mask & after
+    if end is not None:
+        before = chunk[time_col] < end
+        mask = before if mask is None else mask & before
+    if mask is not None:
+        chunk = chunk.loc[mask.to_numpy(), keep].reset_index(drop=True)
+
+    for col in categories:
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype("category")
+    return chunk
+
+
+def iter_sheet_chunks(path, sheet, header=0, columns=None, emails=None, begin=None, end=None,
+                      categories=(), chunk_rows=CHUNK_ROWS, email_col="User email", time_col="Timestamp"):
+    """
+    Yield typed frames of at most chunk_rows worksheet rows.
+
+    header is the 0-based header row, as for pd.read_excel. emails keeps only
+    rows whose email_col is one of the given values; begin/end keep rows with
+    begin <= time_col < end. Blank rows are skipped.
+    """
+    # Imported here: only processes that parse a workbook need openpyxl
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet]
+        header_row = header + 1
+        labels = list(next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True)))
+        keep = labels if columns is None else list(columns)
+        missing = [col for col in keep if col not in labels]
+        if missing:
+            raise KeyError(f"columns not in sheet {sheet!r}: {missing}")
+
+        # Predicate columns are read even when they are not returned
+        names = list(keep)
+        if emails is not None and email_col not in names:
+            names.append(email_col)
+        if (begin is not None or end is not None) and time_col not in names:
+            names.append(time_col)
+        positions = [labels.index(col) for col in names]
+        emails = None if emails is None else list(emails)
+
+        def flush(rows):
+            return _typed_chunk(names, rows, keep, categories, emails, begin, end, email_col, time_col)
+
+        rows = []
+        for values in ws.iter_rows(min_row=header_row + 1, max_col=max(positions) + 1, values_only=True):
+            if all(v is None for v in values):
+                continue
+            rows.append([values[i] if i < len(values) else None for i in positions])
+            if len(rows) >= chunk_rows:
+                yield flush(rows)
+                rows = []
+        if rows:
+            yield flush(rows)
+    finally:
+        wb.close()
+
+
+def concat_chunks(chunks, columns=(), categories=()):
+    """
+    Concatenate typed chunks, merging each chunk's categories instead of
+    falling back to object columns
+    """
+    chunks = [chunk for chunk in chunks if len(chunk)]
+    if not chunks:
+        return pd.DataFrame(columns=list(columns))
+    merged = {}
+    for col in categories:
+        if col in chunks[0].columns:
+            merged[col] = union_categoricals([chunk[col] for chunk in chunks], sort_categories=True)
+    df = pd.concat([chunk.drop(columns=list(merged)) for chunk in chunks], ignore_index=True)
+    for col, values in merged.items():
+        df[col] = values
+    return df[list(chunks[0].columns)]
+
+
+def read_sheet(path, sheet, header=0, columns=None, categories=(), **filters):
+    """
+    Read a worksheet in chunks into one frame (see iter_sheet_chunks for filters)
+    """
+    chunks = iter_sheet_chunks(path, sheet, header, columns, categories=categories, **filters)
+    return concat_chunks(chunks, columns or (), categories)
@@ -0,0 +1,176 @@
+"""
+Time aggregation at several granularities in one pass.
+
+Dates are turned into integer day numbers once; week, month and year keys
+are derived from them arithmetically (no re-sorting or re-hashing of the
+timestamps per granularity):
+
+    D   days since 1970-01-01
+    W   weeks ending on Sunday, like resample("W")
+    ME  months since 1970-01
+    YE  calendar years
+
+Distinct counts are de-duplicated once at day level and coarser buckets are
+derived from the (day, value) pairs; counts and additive measures are totalled
+with np.bincount over the dense key range instead of sorting. Results are
+labelled like resample (period end) and, without groups, cover every period in
+the range the way resample does; daily results only hold days that have rows,
+like groupby.
+
+    buckets = TimeBuckets(rollup["Date"])
+    counts = buckets.distinct(session_ids)      # {"D": Series, "W": ..., ...}
+"""
+import numpy as np
+import pandas as pd
+
+FREQS = ("D", "W", "ME", "YE")
+
+
+def bucket_keys(days, freq):
+    """
+    Integer bucket key of each day number for a granularity
+    """
+    if freq == "D":
+        return days
+    if freq == "W":
+        # Day 0 is a Thursday; weeks run Monday..Sunday
+        return (days + 3) // 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if freq == "ME":
+        return months
+    if freq == "YE":
+        return months // 12
+    raise ValueError(f"unsupported granularity: {freq!r}")
+
+
+def bucket_labels(keys, freq):
+    """
+    Period-end dates (datetime64[D]) of bucket keys, as resample labels them
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if freq == "D":
+        return keys.astype("datetime64[D]")
+    if freq == "W":
+        return (keys * 7 + 3).astype("datetime64[D]")
+    if freq == "ME":
+        return (keys + 1).astype("datetime64[M]").astype("datetime64[D]") - np.timedelta64(1, "D")
+    if freq == "YE":
+        return (keys + 1).astype("datetime64[Y]").astype("datetime64[D]") - np.timedelta64(1, "D")
+    raise ValueError(f"unsupported granularity: {freq!r}")
+
+
+def _codes(values):
+    # Integer codes (-1 for missing) and the distinct values, keeping
+    # categorical order so grouped output sorts like groupby(observed=True)
+    if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+        return np.asarray(values.cat.codes, dtype=np.int64), values.cat.categories
+    if isinstance(values, np.ndarray) and values.dtype.kind in "iu":
+        # Integer values (e.g. rollup session codes) hash without boxing
+        codes, uniques = pd.factorize(values, sort=False)
+        return codes.astype(np.int64), uniques
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object), sort=False)
+    return codes.astype(np.int64), uniques
+
+
+class TimeBuckets:
+    """
+    Rows bucketed by date at several granularities, optionally per group
+    """
+
+    def __init__(self, dates, groups=None, freqs=FREQS):
+        dates = pd.Series(dates)
+        self.dtype = dates.dtype
+        self.freqs = tuple(freqs)
+        self.days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+        if groups is None:
+            self.group_codes, self.group_values = np.zeros(len(self.days), dtype=np.int64), None
+        else:
+            self.group_codes, self.group_values = _codes(groups)
+        self.ngroups = 1 if self.group_values is None else max(1, len(self.group_values))
+        # Rows with a missing group are left out, like groupby
+        self.valid = self.group_codes >= 0
+        self._keys = {}
+
+    def keys(self, freq):
+        """
+        Integer bucket key of every row (computed once per granularity)
+        """
+        if freq not in self._keys:
+            self._keys[freq] = bucket_keys(self.days, freq)
+        return self._keys[freq]
+
+    def _result(self, freq, combined, columns, name):
+        # combined: sorted unique bucket*ngroups+group keys; columns: values per key
+        buckets, groups = np.divmod(combined, self.ngroups)
+        if self.group_values is None:
+            if freq != "D" and len(buckets):
+                # Every period of the range, like resample
+                full = np.arange(buckets.min(), buckets.max() + 1)
+                columns = {col: self._fill(full, buckets, values) for col, values in columns.items()}
+                buckets = full
+            index = pd.DatetimeIndex(bucket_labels(buckets, freq).astype(self.dtype), name="Date")
+        else:
+            index = pd.MultiIndex.from_arrays(
+                [bucket_labels(buckets, freq).astype(self.dtype), self.group_values.take(groups)],
+                names=["Date", name],
+            )
+        return pd.DataFrame(columns, index=index)
+
+    @staticmethod
+    def _fill(full, buckets, values):
+        out = np.zeros(len(full), dtype=np.asarray(values).dtype)
+        out[buckets - full[0]] = values
+        return out
+
+    @staticmethod
+    def _dense(keys, weights=None):
+        # Per-key totals over the dense key range (bucket keys span few
+        # values), avoiding a sort: (present keys, counts or summed weights)
+        if not len(keys):
+            return keys, np.zeros(0, dtype=np.int64 if weights is None else np.float64)
+        low = keys.min()
+        counts = np.bincount(keys - low)
+        present = np.flatnonzero(counts)
+        if weights is None:
+            return present + low, counts[present]
+        return present + low, np.bincount(keys - low, weights=weights)[present]
+
+    def distinct(self, values, freqs=None, name="Group"):
+        """
+        Number of distinct values per bucket: {freq: Series}
+        """
+        freqs = self.freqs if freqs is None else freqs
+        codes, uniques = _codes(values)
+        keep = (codes >= 0) & self.valid
+        nvalues = max(1, len(uniques))
+        days, groups, codes = self.days[keep], self.group_codes[keep], codes[keep]
+        # De-duplicate once at day level (hash based); coarser buckets start
+        # from these pairs
+        pairs = pd.unique((days * self.ngroups + groups) * nvalues + codes)
+        day_groups, codes = np.divmod(pairs, nvalues)
+        days, groups = np.divmod(day_groups, self.ngroups)
+
+        out = {}
+        for freq in freqs:
+            bucket_groups = bucket_keys(days, freq) * self.ngroups + groups
+            if freq != "D":
+                bucket_groups = pd.unique(bucket_groups * nvalues + codes) // nvalues
+            combined, counts = self._dense(bucket_groups)
+            out[freq] = self._result(freq, combined, {"count": counts}, name)["count"]
+        return out
+
+    def sums(self, columns, freqs=None, name="Group"):
+        """
+        Per-bucket sums of additive measures: {freq: DataFrame}
+        """
+        freqs = self.freqs if freqs is None else freqs
+        out = {}
+        for freq in freqs:
+            keys = (self.keys(freq) * self.ngroups + self.group_codes)[self.valid]
+            combined, _ = self._dense(keys)
+            totals = {
+                col: self._dense(keys, np.asarray(values, dtype=np.float64)[self.valid])[1]
+                for col, values in columns.items()
+            }
+            out[freq] = self._result(freq, combined, totals, name)
+        return out
@@ -0,0 +1,178 @@
+"""
+Lightweight timing spans for the pages and the data layer.
+
+Tracing is off unless NC_TRACE=1. When off, span() returns a shared no-op
+context manager and the page helpers return immediately, so instrumented code
+pays one attribute check per call.
+
+When on, every closed span is appended as one JSON line to NC_TRACE_LOG
+(default .cache/trace.jsonl):
+
+    {"ts": ..., "run": "3f2a...", "page": "HORPT1", "span": "aggregate",
+     "parent": "report", "depth": 1, "ms": 12.4, "user": "a@b.com"}
+
+Library code wraps its hot paths in spans:
+
+    with trace.span("aggregate", report=self.name):
+        ...
+
+Page scripts are flat, so they mark sequential stages instead; each stage
+runs until the next one starts or the run ends:
+
+    run = trace.begin("HORPT1", user=email)
+    trace.stage("load")
+    ...
+    trace.stage("render")
+    ...
+    trace.end()
+    # run.table() is the per-rerun breakdown shown to admins
+
+Spans opened outside a page run (batch jobs, background refreshes) are logged
+with run=None.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+ENABLED = os.environ.get("NC_TRACE", "") not in ("", "0")
+# Same default directory as ncdash.data.CACHE_DIR (not imported: data imports this module)
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_PATH = os.environ.get("NC_TRACE_LOG",
+                          os.path.join(os.environ.get("NC_CACHE_DIR", os.path.join(_ROOT, ".cache")), "trace.jsonl"))
+
+_NOOP = contextlib.nullcontext()
+_local = threading.local()  # Streamlit runs each session's script on its own thread
+_write_lock = threading.Lock()
+
+
+def _write(record):
+    try:
+        os.makedirs(os.path.dirname(LOG_PATH) or ".", exist_ok=True)
+        line = json.dumps(record, default=str)
+        with _write_lock, open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    except OSError:
+        # Timing logs must never break a page
+        pass
+
+
+class Run:
+    """
+    Spans recorded during one page rerun
+    """
+
+    def __init__(self, page, **fields):
+        self.id = uuid.uuid4().hex[:12]
+        self.page = page
+        self.fields = fields
+        self.records = []
+        self.stack = []  # names of the open spans
+        self.stage = None  # (name, start) of the open page stage
+
+    def table(self):
+        """
+        Span timings of this run, in completion order, indented by depth
+        """
+        if not self.records:
+            return pd.DataFrame(columns=["span", "ms"])
+        return pd.DataFrame({
+            "span": ["· " * r["depth"] + r["span"] for r in self.records],
+            "ms": [round(r["ms"], 1) for r in self.records],
+        })
+
+
+def current():
+    """
+    The run of the calling thread's page rerun, or None
+    """
+    return getattr(_local, "run", None)
+
+
+def _close(run, name, start, fields):
+    elapsed = (time.perf_counter() - start) * 1000
+    if run is not None and run.stack:
+        run.stack.pop()
+    record = {
+        "ts": time.time(),
+        "run": None if run is None else run.id,
+        "page": None if run is None else run.page,
+        "span": name,
+        "parent": run.stack[-1] if run is not None and run.stack else None,
+        "depth": len(run.stack) if run is not None else 0,
+        "ms": elapsed,
+        **({} if run is None else run.fields),
+        **fields,
+    }
+    if run is not None:
+        run.records.append(record)
+    _write(record)
+
+
+@contextlib.contextmanager
+def _span(name, fields):
+    run = current()
+    if run is not None:
+        run.stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _close(run, name, start, fields)
+
+
+def span(name, **fields):
+    """
+    Context manager timing the enclosed block (no-op unless tracing is enabled)
+    """
+    if not ENABLED:
+        return _NOOP
+    return _span(name, fields)
+
+
+def begin(page, **fields):
+    """
+    Start recording a page rerun; returns the Run, or None when tracing is off
+    """
+    if not ENABLED:
+        return None
+    _local.run = Run(page, **fields)
+    return _local.run
+
+
+def stage(name):
+    """
+    End the current page stage (if any) and start the next one
+    """
+    run = current()
+    if run is None:
+        return
+    _end_stage(run)
+    run.stack.append(name)
+    run.stage = (name, time.perf_counter())
+
+
+def _end_stage(run):
+    if run.stage is not None:
+        name, start = run.stage
+        run.stage = None
+        # Spans left open by an exception inside the stage
+        if name in run.stack:
+            del run.stack[run.stack.index(name) + 1:]
+        _close(run, name, start, {})
+
+
+def end():
+    """
+    Close the open stage and stop recording; returns the finished Run
+    """
+    run = current()
+    if run is None:
+        return None
+    _end_stage(run)
+    _local.run = None
+    return run
@@ -0,0 +1,158 @@
+"""
+Process warm-up and the startup import budget.
+
+A cold app process pays for importing the charting and Sheets libraries and
+for loading the workbooks when the first user opens a page. The login script
+calls start() on every run; the first call in a process starts a background
+thread that starts the permissions fetch (ncdash/permissions.py), loads the
+shared frames and their indexes and imports the libraries the pages and the
+login defer (DEFERRED_MODULES). Later calls
+return immediately. Workers started by ncdash/serve.py start warming up when
+the process starts, before the first connection:
+
+    python -m ncdash.warmup run APP [streamlit options]
+
+The login form only needs STARTUP_MODULES, so they are what a new process must
+import before it can serve anyone. `python -m ncdash.warmup` times that import
+in a fresh interpreter against NC_IMPORT_BUDGET_MS (exit status 1 when over
+budget), reports the cold import time of each deferred module, and fills the
+on-disk data caches. Run it as a deploy check or in the image build.
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from ncdash import trace
+
+# What the login script imports before rendering the form
+STARTUP_MODULES = ("streamlit", "pandas", "ncdash.permissions", "ncdash.trace", "ncdash.warmup")
+# Imported where they are used, and preloaded by warm_up
+DEFERRED_MODULES = ("altair", "plotly.express", "plotly.io", "gspread", "google.oauth2.service_account")
+IMPORT_BUDGET_MS = float(os.environ.get("NC_IMPORT_BUDGET_MS", 1500))
+
+_lock = threading.Lock()
+_started = {}  # "thread" -> the warm-up thread of this process
+
+
+def _data_steps():
+    from ncdash.index import load_checkin_index, load_journal_index
+    from ncdash.places import load_place_index
+    from ncdash.rollup import load_rollup_index
+
+    return {
+        "checkins": load_checkin_index,
+        "journal": load_journal_index,
+        "rollup": load_rollup_index,
+        "places": load_place_index,
+    }
+
+
+def prefetch_permissions():
+    """
+    Create the process-wide permissions store (loading its snapshot) and start
+    its first fetch in the background
+    """
+    import streamlit as st
+
+    from ncdash.permissions import shared_store
+
+    shared_store(st.secrets).prefetch()
+
+
+def warm_up(modules=DEFERRED_MODULES, data=True, permissions=True):
+    """
+    Start the permissions fetch, load the shared data (indexes included) and
+    import modules; returns {step: milliseconds}, None for a step that failed
+    """
+    # First: the fetch runs on its own thread while the data loads
+    steps = {"permissions": prefetch_permissions} if permissions else {}
+    steps.update(_data_steps() if data else {})
+    steps.update({module: (lambda module=module: importlib.import_module(module)) for module in modules})
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            with trace.span("warmup", step=name):
+                step()
+        except Exception:
+            # A missing workbook or library surfaces on the page that uses it
+            timings[name] = None
+            continue
+        timings[name] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def start():
+    """
+    Run warm_up on a background thread, once per process; returns the thread
+    """
+    with _lock:
+        if "thread" not in _started:
+            thread = threading.Thread(target=warm_up, name="ncdash-warmup", daemon=True)
+            thread.start()
+            _started["thread"] = thread
+        return _started["thread"]
+
+
+def import_time(modules):
+    """
+    Milliseconds a fresh interpreter takes to import modules
+    """
+    code = ("import time; started = time.perf_counter(); "
+            f"import {', '.join(modules)}; "
+            "print((time.perf_counter() - started) * 1000)")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def check(budget_ms=IMPORT_BUDGET_MS):
+    """
+    Print the startup import time against the budget, each deferred module's
+    import time and the data warm-up timings; returns True within budget
+    """
+    startup = import_time(STARTUP_MODULES)
+    print(f"startup imports: {startup:.0f} ms (budget {budget_ms:.0f} ms)")
+    for module in DEFERRED_MODULES:
+        try:
+            print(f"  deferred {module}: {import_time((module,)):.0f} ms")
+        except subprocess.CalledProcessError:
+            print(f"  deferred {module}: not installed")
+    for name, ms in warm_up(modules=(), permissions=False).items():
+        print(f"  data {name}: " + ("failed" if ms is None else f"{ms:.0f} ms"))
+    return startup <= budget_ms
+
+
+def run_streamlit(app, options):
+    """
+    Start the warm-up thread, then run the Streamlit app in this process
+    """
+    from streamlit.web import cli
+
+    start()
+    sys.exit(cli.main(["run", app, *options], prog_name="streamlit"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm the app caches and check the startup import budget")
+    parser.add_argument("command", nargs="?", choices=("check", "run"), default="check",
+                        help="check (default): time imports and fill data caches; run: serve APP warmed up")
+    parser.add_argument("app", nargs="?", help="app script for run")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                        help=f"startup import budget (default: NC_IMPORT_BUDGET_MS or {IMPORT_BUDGET_MS:.0f})")
+    args, options = parser.parse_known_args(argv)
+    if args.command == "run":
+        if not args.app:
+            parser.error("run needs the app script")
+        run_streamlit(args.app, options)
+    elif options:
+        parser.error(f"unrecognized arguments: {' '.join(options)}")
+    else:
+        sys.exit(0 if check(args.budget_ms) else 1)
+
+
+if __name__ == "__main__":
+    main()
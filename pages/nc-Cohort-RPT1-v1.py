@@ -0,0 +1,113 @@
+import streamlit as st
+import pandas as pd
+
+from ncdash.export import FORMATS, export_opener, page, page_count
+from ncdash import trace
+from ncdash.memo import session_cache
+from ncdash.reports import COHORT_RPT1, FilterSpec, SharedSource
+from ncdash.results import ResultStore
+
+st.set_page_config(page_title="Cohort RPT: Users Compared with the Cohort", layout="wide")
+st.title("👥 Cohort Comparison (Cohort RPT)")
+
+# Check login
+if not st.session_state.get("authenticated", False):
+    st.warning("Please log in first from the main page.")
+    st.stop()
+
+email = st.session_state["user_email"]
+role = st.session_state["user_role"]
+st.write(f"**You are logged in under {email} as {role}**")
+
+if role != "admin":
+    st.warning("The cohort comparison is available to admins only.")
+    st.stop()
+
+# Time the load / report / render stages of this rerun (NC_TRACE=1)
+run = trace.begin("CohortRPT1", user=email, role=role)
+trace.stage("load")
+
+# Shared data: check-in rollup and journal entries of every user
+source = SharedSource()
+default = COHORT_RPT1.default_spec(source)
+
+# Sidebar filters
+st.sidebar.header("📅 Filter Options")
+start_date = st.sidebar.date_input("Start Date", value=default.start_date)
+end_date = st.sidebar.date_input("End Date", value=default.end_date)
+
+# Indicators limit the check-in metrics (sessions, check-ins, rating, score)
+indicators = source.rollup.frame["Indicator"].dropna().unique()
+selected_indicators = st.sidebar.multiselect("🎯 Indicators (check-in metrics)", indicators)
+
+trace.stage("report")
+# Every user's metrics, percentiles and distributions come from one pass in
+# the report layer (ncdash/cohort.py). Results are memoized per session; the
+# full-range view is precomputed by ncdash/precompute.py
+spec = FilterSpec.build(start_date, end_date, indicators=selected_indicators)
+memo = session_cache(st.session_state)
+key = COHORT_RPT1.cache_key(source, spec)
+report = memo.get_or_compute(key, lambda: ResultStore().fetch(key, lambda: COHORT_RPT1.run(source, spec)))
+st.sidebar.caption(memo.summary())
+st.sidebar.caption(ResultStore().summary())
+
+if report is None:
+    st.warning("No data found for the selected filters.")
+    trace.end()
+    st.stop()
+
+trace.stage("render")
+# Charting libraries are imported on first render, not before the login check
+# (the login page preloads them in the background, see ncdash/warmup.py)
+import plotly.express as px
+
+users = report.users
+st.metric("Users in Cohort", len(users))
+
+st.subheader("Cohort Distribution by Metric")
+st.dataframe(report.summary.round(2))
+
+# One user against the cohort
+col1, col2 = st.columns(2)
+with col1:
+    user_list = list(users.index)
+    selected_user = st.selectbox("👤 User", user_list, index=user_list.index(email) if email in user_list else 0)
+with col2:
+    metric = st.selectbox("📏 Metric", list(users.columns))
+
+value = users.at[selected_user, metric]
+percentile = report.percentiles.at[selected_user, metric]
+col3, col4, col5 = st.columns(3)
+col3.metric(f"{metric} of {selected_user}", "—" if pd.isna(value) else f"{value:,.2f}".rstrip("0").rstrip("."))
+col4.metric("Percentile in Cohort", "—" if pd.isna(percentile) else f"{percentile:.0f}")
+col5.metric("Cohort Median", f"{report.summary.at[metric, 'P50']:,.2f}".rstrip("0").rstrip("."))
+
+# The histogram is precomputed per metric; the page only draws its bins
+hist = report.distributions[metric]
+chart = px.bar(hist.assign(Bin=(hist["Low"] + hist["High"]) / 2), x="Bin", y="Users",
+               title=f"Users by {metric}")
+chart.update_traces(width=(hist["High"] - hist["Low"]).tolist() if len(hist) else None)
+if not pd.isna(value):
+    chart.add_vline(x=value, line_dash="dash", annotation_text=selected_user)
+chart.update_layout(xaxis_title=metric, bargap=0.05)
+st.plotly_chart(chart, use_container_width=True)
+
+st.subheader("Per-User Metrics and Percentiles")
+table = users.join(report.percentiles.add_suffix(" pct")).reset_index()
+# Only one page of rows is sent to the browser; the whole table is a
+# download, exported in chunks when the button is clicked
+pages = page_count(len(table))
+table_page = st.number_input("Table page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+shown, first, last = page(table, table_page)
+st.dataframe(shown)
+st.caption(f"Rows {first:,}–{last:,} of {len(table):,}")
+csv_col, parquet_col = st.columns(2)
+csv_col.download_button("⬇️ Download CSV", export_opener(table, "csv", (*key, "users")),
+                        file_name="cohort-users.csv", mime=FORMATS["csv"], on_click="ignore")
+parquet_col.download_button("⬇️ Download Parquet", export_opener(table, "parquet", (*key, "users")),
+                            file_name="cohort-users.parquet", mime=FORMATS["parquet"], on_click="ignore")
+
+# Timing breakdown of this rerun (only recorded with NC_TRACE=1)
+trace.end()
+if run is not None:
+    st.sidebar.expander("⏱️ Timings").dataframe(run.table())
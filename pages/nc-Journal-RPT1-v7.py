@@ -1,11 +1,11 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
-import plotly.express as px
-import plotly.io as pio
 
-# import plotly.graph_objects as go
-pio.templates.default = "plotly"
+from ncdash.charts import MAX_POINTS, bucket_time
+from ncdash.export import FORMATS, export_opener, page, page_count
+from ncdash import trace
+from ncdash.memo import session_cache
+from ncdash.reports import JOURNAL_RPT1, FilterSpec, SharedSource
+from ncdash.results import ResultStore
 
 st.set_page_config(page_title="Journal RPT: Journal Reportss", layout="wide")
 st.title("📊 Journal Reports (Journal RPT)")
@@ -19,57 +19,69 @@ email = st.session_state["user_email"]
 role = st.session_state["user_role"]
 st.write(f"**You are logged in under {email} as {role}**")
 
-# Load data
-df = pd.read_excel("NC-Journal-Data.xlsx", sheet_name="Journal-Data-wo-link", header=1)
-df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+# Time the load / report / render stages of this rerun (NC_TRACE=1)
+run = trace.begin("JournalRPT1", user=email, role=role)
+trace.stage("load")
+
+# Shared data (parsed once per process, indexed by email and Timestamp)
+source = SharedSource()
 
 # Filter by user
-if role != "admin":
-    df = df[df["User email"] == email]
+user_emails = [email] if role != "admin" else None
+first_ts, last_ts = source.journal.span(user_emails)
 
 # Sidebar filters
 st.sidebar.header("📅 Filter Options")
-start_date = st.sidebar.date_input("Start Date", value=df["Timestamp"].min())
-end_date = st.sidebar.date_input("End Date", value=df["Timestamp"].max())
+start_date = st.sidebar.date_input("Start Date", value=first_ts)
+end_date = st.sidebar.date_input("End Date", value=last_ts)
 # User input for Top N places
 # fil_places = df["n_place"].dropna().unique() # if more than xx, perhaps just ask for input
 # top_n = st.sidebar.slider("Select Top N Places", min_value=1, max_value=10, value=5)
 
 # if admin, ask email filtering
 if role == "admin":
-    fil_emails = df["User email"].dropna().unique() # if more than xx, perhaps just ask for input
+    fil_emails = source.journal.emails # if more than xx, perhaps just ask for input
     selected_emails = st.sidebar.multiselect("🎯 Select up to 3 emails", fil_emails, max_selections=3)
 #   selected_emails = st.text_input("Enter user email to filter:").strip().lower()
 else:
-    selected_emails = ""
+    selected_emails = user_emails
 
 # indicators = df["Indicator"].dropna().unique()
 # selected_indicators = st.sidebar.multiselect("🎯 Select up to 3 Indicators", indicators, max_selections=3)
 
-# Apply filters
-mask = (df["Timestamp"] >= pd.to_datetime(start_date)) & (df["Timestamp"] <= pd.to_datetime(end_date))
-#if selected_indicators:
-#    mask &= df["Indicator"].isin(selected_indicators)
-if selected_emails:
-    mask &= df["User email"].isin(selected_emails)
-
-filtered = df[mask]
+trace.stage("report")
+# Run the report (whole days, end date included); results are memoized per
+# session, keyed by the data version and filter spec, so moving the Top N
+# slider does not regroup the data. A user's default view is usually
+# precomputed by ncdash/precompute.py and read from the result store
+spec = FilterSpec.build(start_date, end_date, emails=selected_emails)
+memo = session_cache(st.session_state)
+key = JOURNAL_RPT1.cache_key(source, spec)
+report = memo.get_or_compute(key, lambda: ResultStore().fetch(key, lambda: JOURNAL_RPT1.run(source, spec)))
+if role == "admin":
+    st.sidebar.caption(memo.summary())
+    st.sidebar.caption(ResultStore().summary())
 
-if filtered.empty:
+if report is None:
     st.warning("No data found for the selected filters.")
+    trace.end()
     st.stop()
 
+trace.stage("render")
+# Charting libraries are imported on first render, not before the login check
+# (the login page preloads them in the background, see ncdash/warmup.py)
+import plotly.express as px
+import plotly.io as pio
+
+# import plotly.graph_objects as go
+pio.templates.default = "plotly"
+
 # Altair bar chart for average rating
 
 # filtered_df = df[df['Indicator'].isin(selected_indicators)]
 
-# Group data and create the line chart
-if filtered.empty:  # Ensure data is not empty before plotting
-     st.warning("No record to show, pls try again.")
-     st.stop()
-
 # Total unique session count
-total_unique_places = filtered["n_Place"].nunique()
+total_unique_places = report.unique_places
 st.metric(label="Total Unique Places: ", value=total_unique_places)
 
 # User input for Top N places
@@ -83,27 +95,42 @@ top_n = st.sidebar.slider("Select Top N Places", min_value=1, max_value=max_fil_
 # top_df = grouped_data[grouped_data['n_Place'].isin(top_places)]
 
 # Total sum of Time spent in Nature
-total_minutes = filtered["n_Duration"].sum()
+total_minutes = report.total_minutes
 hours = total_minutes // 60
 minutes = total_minutes % 60
 st.metric("Total Time in Nature: ", f"{hours}h {minutes}m")
 
-# Group by 'Date' and 'Place' and count occurrences
-# if admin -- i think we need to group by email, date, n_place
-grouped_data = filtered.groupby([filtered['Timestamp'].dt.date, 'n_Place']).agg(
-    Count=('n_Place', 'size'),
-    Unique_places=('n_Place', 'unique'),
-    SumMin=('n_Duration', 'sum'),
-    Latitude=('n_Lati', 'mean'),
-    Longitude=('n_Long', 'mean')
-).reset_index().sort_values('SumMin', ascending=False).rename(columns={'Timestamp': 'Date'})
+grouped_data = report.grouped
 
 # Group by Date and Indicator and aggregate rating
     
 st.subheader("Aggregated Counts of Nature Places I visited")
-st.dataframe(grouped_data)
+# Only one page of rows is sent to the browser; the whole table is a
+# download, exported in chunks when the button is clicked
+pages = page_count(len(grouped_data))
+table_page = st.number_input("Table page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+shown, first, last = page(grouped_data, table_page)
+st.dataframe(shown, column_config={"Date": st.column_config.DateColumn("Date")})
+st.caption(f"Rows {first:,}–{last:,} of {len(grouped_data):,}")
+csv_col, parquet_col = st.columns(2)
+csv_col.download_button("⬇️ Download CSV", export_opener(grouped_data, "csv", (*key, "grouped")),
+                        file_name="journal-places.csv", mime=FORMATS["csv"], on_click="ignore")
+parquet_col.download_button("⬇️ Download Parquet", export_opener(grouped_data, "parquet", (*key, "grouped")),
+                            file_name="journal-places.parquet", mime=FORMATS["parquet"], on_click="ignore")
 
 st.subheader(" 📆 RPT1: How much time (in minutes) & where did I spend in Nature?")
+# Chart data is reduced server-side to stay within the browser payload budget
+bar_data, bar_note = bucket_time(grouped_data[['Date', 'n_Place', 'Count', 'SumMin']], 'Date',
+                                 {'Count': 'sum', 'SumMin': 'sum'}, group_col='n_Place')
+# The map shows one marker per grid cell (total minutes per cell); the finest
+# zoom level that fits the point budget is the default, coarser levels merge
+# nearby places
+grid = report.grid
+max_level = grid.level_for(MAX_POINTS)
+map_level = st.sidebar.slider("🗺️ Map detail (grid zoom level)", min_value=0, max_value=max(max_level, 1),
+                              value=max_level)
+map_data = grid.cells(map_level)
+
 # Create columns
 col1, col2 = st.columns(2)
 col3, col4 = st.columns(2)
@@ -111,7 +138,7 @@ col3, col4 = st.columns(2)
 # Stack Bar Chart in the first column
 with col1:
 # st.subheader(" 📆 StackBar Chart: ")
-  chart1 = px.bar(grouped_data, 
+  chart1 = px.bar(bar_data, 
     x='Date',
     y='Count',
     color='n_Place',  # Color by place
@@ -129,16 +156,20 @@ with col1:
 # Display the chart
   # st.write("Count of Places by Date")
   st.plotly_chart(chart1, use_container_width=True)
+  if bar_note:
+      st.caption(bar_note)
 
 # Map plot in the second column
 with col2:
       # st.subheader("📆 Map: ")
   st.write("Location Map:")
-  st.map(grouped_data, latitude='Latitude', longitude='Longitude') 
+  st.map(map_data, latitude='Latitude', longitude='Longitude', size='Radius')
+  st.caption(f"{len(map_data):,} grid cells at zoom level {map_level} from {len(grid):,} visits; "
+             "marker size shows total nature minutes.")
 
 with col3:
 # st.subheader(" 📆 StackBar Chart: ")
-  chart2 = px.bar(grouped_data, 
+  chart2 = px.bar(bar_data, 
     x='Date',
     y='SumMin',
     color='n_Place',  # Color by place
@@ -155,19 +186,23 @@ with col3:
   # Display the chart
   # st.write("Sum of Nature Time by Date")
   st.plotly_chart(chart2, use_container_width=True)
+  if bar_note:
+      st.caption(bar_note)
 
 with col4:
     # Get top N places
     # top_places = grouped_data.sort_values(by='SumMin', ascending=False).head(top_n)
-    display_top_n = grouped_data.nlargest(top_n, "SumMin")
+    # Place totals of the selected range come from the place index
+    # (ncdash/places.py); picking the top N is a heap selection
+    display_top_n = report.places.top(top_n)
     st.write(" \n     ")
     # st.write("Content for Row 2, Column 2 TBD")
-    st.write(f"**Top {top_n} Places Visited in Selected Date**")
+    st.write(f"**Top {top_n} Places Visited in Selected Dates**")
     # st.dataframe(top_places)
     # df = pd.DataFrame(top_places)
 
     # Create the pie chart
-    chart4 = px.pie(display_top_n, values='SumMin', names='Unique_places')
+    chart4 = px.pie(display_top_n, values='SumMin', names='n_Place')
     # Display the pie chart in Streamlit
     chart4.update_layout(
       legend=dict(
@@ -214,4 +249,9 @@ with col4:
 
 # Display the sorted data
 # st.write("Aggregated Data (Sorted):")
-# st.dataframe(aggregated_data)
\ No newline at end of file
+# st.dataframe(aggregated_data)
+
+# Timing breakdown of this rerun (only recorded with NC_TRACE=1)
+trace.end()
+if run is not None and role == "admin":
+    st.sidebar.expander("⏱️ Timings").dataframe(run.table())
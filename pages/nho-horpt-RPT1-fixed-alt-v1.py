@@ -1,6 +1,12 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
+
+from ncdash.charts import finest_fitting
+from ncdash.export import FORMATS, export_opener, page, page_count
+from ncdash import trace
+from ncdash.memo import session_cache
+from ncdash.reports import HORPT1, FilterSpec, SharedSource
+from ncdash.rollup import APPROX_DEFAULT
+from ncdash.results import ResultStore
 
 st.set_page_config(page_title="HORPT1: Unique Session Check-ins", layout="wide")
 st.title("📊 HO Number of Unique Check-in Sessions (HORPT1)")
@@ -14,40 +20,68 @@ email = st.session_state["user_email"]
 role = st.session_state["user_role"]
 st.write(f"**You are logged in under {email} as {role}**")
 
-# Load and prep data
-df = pd.read_excel("NHO-check-in-chart.xlsx", sheet_name="00-HO-Data-Prime-no-link")
+# Time the load / report / render stages of this rerun (NC_TRACE=1)
+run = trace.begin("HORPT1", user=email, role=role)
+trace.stage("load")
 
-# Convert Timestamp to datetime
-df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+# Shared data (parsed once per process, indexed by email and Timestamp)
+source = SharedSource()
 
 # Filter by user
-if role != "admin":
-    df = df[df["User email"] == email]
+user_emails = [email] if role != "admin" else None
+first_ts, last_ts = source.checkins.span(user_emails)
 
 # Sidebar filters
 st.sidebar.header("📅 Filter by Date Range")
-start_date = st.sidebar.date_input("Start Date", value=df["Timestamp"].min())
-end_date = st.sidebar.date_input("End Date", value=df["Timestamp"].max())
+start_date = st.sidebar.date_input("Start Date", value=first_ts)
+end_date = st.sidebar.date_input("End Date", value=last_ts)
+# Admin views over all users can estimate distinct counts (HyperLogLog)
+approx = role == "admin" and st.sidebar.checkbox("Approximate unique counts (faster for long ranges)",
+                                                 value=APPROX_DEFAULT)
+
+trace.stage("report")
+# Run the report (whole days, end date included); results are memoized per
+# session, keyed by the data version and filter spec. A user's default view
+# is usually precomputed by ncdash/precompute.py and read from the result store
+spec = FilterSpec.build(start_date, end_date, emails=user_emails, approx=approx)
+memo = session_cache(st.session_state)
+key = HORPT1.cache_key(source, spec)
+report = memo.get_or_compute(key, lambda: ResultStore().fetch(key, lambda: HORPT1.run(source, spec)))
+if role == "admin":
+    st.sidebar.caption(memo.summary())
+    st.sidebar.caption(ResultStore().summary())
 
-# Apply date filter
-mask = (df["Timestamp"] >= pd.to_datetime(start_date)) & (df["Timestamp"] <= pd.to_datetime(end_date))
-filtered = df[mask]
+trace.stage("render")
+# Charting libraries are imported on first render, not before the login check
+# (the login page preloads them in the background, see ncdash/warmup.py)
+import altair as alt
 
+filtered = HORPT1.rows(source, spec)
 st.subheader("Filtered Data")
-st.dataframe(filtered)
+# Only one page of rows is sent to the browser; the whole table is a
+# download, exported in chunks when the button is clicked
+pages = page_count(len(filtered))
+table_page = st.number_input("Table page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+shown, first, last = page(filtered, table_page)
+st.dataframe(shown)
+st.caption(f"Rows {first:,}–{last:,} of {len(filtered):,}")
+csv_col, parquet_col = st.columns(2)
+csv_col.download_button("⬇️ Download CSV", export_opener(filtered, "csv", (*key, "rows")),
+                        file_name="horpt1-checkins.csv", mime=FORMATS["csv"], on_click="ignore")
+parquet_col.download_button("⬇️ Download Parquet", export_opener(filtered, "parquet", (*key, "rows")),
+                            file_name="horpt1-checkins.parquet", mime=FORMATS["parquet"], on_click="ignore")
 
 # Total unique session count
-total_unique_sessions = filtered["Session id"].nunique()
+total_unique_sessions = report.total_sessions
 st.metric(label="Total Unique Sessions", value=total_unique_sessions)
+if report.error:
+    st.caption(f"Unique session counts are estimates (typical error ±{report.error:.1%}).")
 
 # ✅ DAILY CHART (Altair version, smaller chart with integer ticks)
 st.markdown("### 📆 Unique Sessions by Day (Compact View)")
-daily_df = (
-    filtered.groupby(filtered["Timestamp"].dt.date)["Session id"]
-    .nunique()
-    .reset_index()
-    .rename(columns={"Timestamp": "Date", "Session id": "Unique Sessions"})
-)
+# Long ranges switch to the exact weekly/monthly/yearly counts to stay within
+# the chart budget (daily distinct counts cannot be summed into coarser bars)
+daily_df, daily_note = finest_fitting(report.granularities())
 
 daily_chart = alt.Chart(daily_df).mark_bar().encode(
     x=alt.X("Date:T", title="Date"),
@@ -63,10 +97,12 @@ daily_chart = alt.Chart(daily_df).mark_bar().encode(
 )
 
 st.altair_chart(daily_chart, use_container_width=False)
+if daily_note:
+    st.caption(daily_note)
 
 # Weekly chart
 st.markdown("### 📆 Unique Sessions by Week")
-weekly = filtered.resample("W", on="Timestamp")["Session id"].nunique()
+weekly = report.weekly
 st.bar_chart(
     weekly, 
     width=400,  # Set the width in pixels 
@@ -76,7 +112,7 @@ st.bar_chart(
 # repeat sizing for the following chart
 # Monthly chart
 st.markdown("### 📆 Unique Sessions by Month")
-monthly = filtered.resample("ME", on="Timestamp")["Session id"].nunique()
+monthly = report.monthly
 st.bar_chart(
     monthly,
     width=400,  # Set the width in pixels 
@@ -86,10 +122,15 @@ st.bar_chart(
 
 # Yearly chart
 st.markdown("### 📆 Unique Sessions by Year")
-yearly = filtered.resample("YE", on="Timestamp")["Session id"].nunique()
+yearly = report.yearly
 st.bar_chart(
     yearly,
     width=400,  # Set the width in pixels 
     height=200, # Set the height in pixels
     use_container_width=False # Ensure width and height are respected
 )
+
+# Timing breakdown of this rerun (only recorded with NC_TRACE=1)
+trace.end()
+if run is not None and role == "admin":
+    st.sidebar.expander("⏱️ Timings").dataframe(run.table())
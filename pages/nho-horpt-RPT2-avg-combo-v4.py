@@ -1,11 +1,12 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
-import plotly.express as px
-import plotly.io as pio
 
-# import plotly.graph_objects as go
-pio.templates.default = "plotly"
+from ncdash.charts import downsample_lines
+from ncdash.export import FORMATS, export_opener, page, page_count
+from ncdash import trace
+from ncdash.memo import session_cache
+from ncdash.reports import HORPT2, FilterSpec, SharedSource
+from ncdash.rollup import APPROX_DEFAULT
+from ncdash.results import ResultStore
 
 st.set_page_config(page_title="HORPT2: HO Avg Rating & Composite Score", layout="wide")
 st.title("📊 HO Avg Rating and Composite Score (HORPT2)")
@@ -19,70 +20,101 @@ email = st.session_state["user_email"]
 role = st.session_state["user_role"]
 st.write(f"**You are logged in under {email} as {role}**")
 
-# Load data
-df = pd.read_excel("NHO-check-in-chart.xlsx", sheet_name="00-HO-Data-Prime-no-link")
-df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+# Time the load / report / render stages of this rerun (NC_TRACE=1)
+run = trace.begin("HORPT2", user=email, role=role)
+trace.stage("load")
+
+# Shared data; this report reads the daily rollup (one row per email x date x indicator)
+source = SharedSource()
 
 # Filter by user
-if role != "admin":
-    df = df[df["User email"] == email]
+user_emails = [email] if role != "admin" else None
+df = source.rollup.rows(user_emails)
 
 # Sidebar filters
 st.sidebar.header("📅 Filter Options")
-start_date = st.sidebar.date_input("Start Date", value=df["Timestamp"].min())
-end_date = st.sidebar.date_input("End Date", value=df["Timestamp"].max())
+start_date = st.sidebar.date_input("Start Date", value=df["Date"].min())
+end_date = st.sidebar.date_input("End Date", value=df["Date"].max())
 
 indicators = df["Indicator"].dropna().unique()
 selected_indicators = st.sidebar.multiselect("🎯 Select up to 3 Indicators", indicators, max_selections=3)
 
 if role == "admin":
-    emails = df["User email"].dropna().unique() # if more than xx, perhaps just ask for input
+    emails = source.rollup.emails # if more than xx, perhaps just ask for input
     selected_emails = st.sidebar.multiselect("🎯 Select up to 3 emails", emails, max_selections=3)
+    # All-user views can estimate distinct counts (HyperLogLog)
+    approx = st.sidebar.checkbox("Approximate unique counts (faster for long ranges)", value=APPROX_DEFAULT)
 #   selected_emails = st.text_input("Enter user email to filter:").strip().lower()
 else:
-    selected_emails = ""
-
-# Apply filters
-mask = (df["Timestamp"] >= pd.to_datetime(start_date)) & (df["Timestamp"] <= pd.to_datetime(end_date))
-if selected_indicators:
-    mask &= df["Indicator"].isin(selected_indicators)
-if selected_emails:
-    mask &= df["User email"].isin(selected_emails)
-
-filtered = df[mask]
+    selected_emails = user_emails
+    approx = False
+
+trace.stage("report")
+# Run the report (whole days, end date included); results are memoized per
+# session, keyed by the data version and filter spec. A user's default view
+# is usually precomputed by ncdash/precompute.py and read from the result store
+spec = FilterSpec.build(start_date, end_date, emails=selected_emails, indicators=selected_indicators,
+                        approx=approx)
+memo = session_cache(st.session_state)
+key = HORPT2.cache_key(source, spec)
+report = memo.get_or_compute(key, lambda: ResultStore().fetch(key, lambda: HORPT2.run(source, spec)))
+if role == "admin":
+    st.sidebar.caption(memo.summary())
+    st.sidebar.caption(ResultStore().summary())
 
-if filtered.empty:
+if report is None:
     st.warning("No data found for the selected filters.")
+    trace.end()
     # st.warning("Please select at least one indicator.")
     st.stop()
 
+trace.stage("render")
+# Charting libraries are imported on first render, not before the login check
+# (the login page preloads them in the background, see ncdash/warmup.py)
+import plotly.express as px
+import plotly.io as pio
+
+# import plotly.graph_objects as go
+pio.templates.default = "plotly"
+
 # Total unique session count
-total_unique_sessions = filtered["sess6digit"].nunique()
+total_unique_sessions = report.total_sessions
 st.metric(label="Total Unique Sessions: ", value=total_unique_sessions)
+if report.error:
+    st.caption(f"Unique session count is an estimate (typical error ±{report.error:.1%}).")
 
 # Average Rating and Composite Score
-mean_ratings = filtered["Rating"].mean()
+mean_ratings, mean_compscores = report.mean_rating, report.mean_score
 rounded_mean_ratings = round(mean_ratings, 2)  # Round to 2 decimal places
 st.metric("Average Rating: ", rounded_mean_ratings)
 
-mean_compscores = filtered["composite_score"].mean()
 rounded_mean_compscores = round(mean_compscores, 2)  # Round to 2 decimal places
 st.metric("Average Composite Score: ", rounded_mean_compscores)
 
 # Group data and create the line chart
-grouped_data = filtered.groupby([filtered['Timestamp'].dt.date, 'Indicator']).agg(
-    Count=('sess6digit', 'nunique'),
-    Compscore=('composite_score', 'mean'),
-    Nrating=('Rating', 'mean')
-    ).reset_index().rename(columns={'Timestamp': 'Date'})
+grouped_data = report.grouped
 
 # Group by Date and Indicator and aggregate composite_score -- old code
 # grouped_data = filtered.groupby([filtered['Timestamp'].dt.date, 'Indicator'])['composite_score'].agg(['mean', 'min', 'max']).reset_index().rename(columns={"Timestamp": "Date", "Indicator": "Indicator", "mean": "Avg", "min": "Min" , "max": "Max"})
    
 st.subheader("Aggregated Rating and Composite-Score Statistics")
-st.dataframe(grouped_data)
+# Only one page of rows is sent to the browser; the whole table is a
+# download, exported in chunks when the button is clicked
+pages = page_count(len(grouped_data))
+table_page = st.number_input("Table page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+shown, first, last = page(grouped_data, table_page)
+st.dataframe(shown)
+st.caption(f"Rows {first:,}–{last:,} of {len(grouped_data):,}")
+csv_col, parquet_col = st.columns(2)
+csv_col.download_button("⬇️ Download CSV", export_opener(grouped_data, "csv", (*key, "grouped")),
+                        file_name="horpt2-scores.csv", mime=FORMATS["csv"], on_click="ignore")
+parquet_col.download_button("⬇️ Download Parquet", export_opener(grouped_data, "parquet", (*key, "grouped")),
+                            file_name="horpt2-scores.parquet", mime=FORMATS["parquet"], on_click="ignore")
 
 st.subheader(" 📆 Avg Ratings and Composite-Scores Over Time for Selected Indicators")
+# Chart data is downsampled per indicator to stay within the browser payload budget
+rating_data, rating_note = downsample_lines(grouped_data, "Date", "Nrating", color="Indicator")
+score_data, score_note = downsample_lines(grouped_data, "Date", "Compscore", color="Indicator")
     # Create columns
 col1, col2 = st.columns(2)
 col3, col4 = st.columns(2)
@@ -90,7 +122,7 @@ col3, col4 = st.columns(2)
 # Line Rating in the first column
 with col1:
       # st.subheader(" 📆 Line Chart: ")
-      line_fig1 = px.line(grouped_data,
+      line_fig1 = px.line(rating_data,
                       x='Date',
                       y='Nrating',
                       color='Indicator',  # Color lines by indicator
@@ -99,11 +131,13 @@ with col1:
        )
       #line_fig.update_layout(width=844, height=390, autosize=False)
       st.plotly_chart(line_fig1, use_container_width=True)
+      if rating_note:
+          st.caption(rating_note)
     
       # Scatter plot in the second column
 with col2:
       # st.subheader("📆 Scatter Chart: ")
-      scatter_fig1 = px.scatter(grouped_data,
+      scatter_fig1 = px.scatter(rating_data,
                       x='Date',
                       y='Nrating',
                       color ='Indicator',  # Color lines by indicator
@@ -112,10 +146,12 @@ with col2:
                       )
       #scatter_fig.update_layout(width=844, height=390, autosize=False)
       st.plotly_chart(scatter_fig1, use_container_width=True)      
+      if rating_note:
+          st.caption(rating_note)
 
 with col3:
       # st.subheader(" 📆 Line Chart: ")
-      line_fig2 = px.line(grouped_data,
+      line_fig2 = px.line(score_data,
                       x='Date',
                       y='Compscore',
                       color='Indicator',  # Color lines by indicator
@@ -124,11 +160,13 @@ with col3:
        )
       #line_fig.update_layout(width=844, height=390, autosize=False)
       st.plotly_chart(line_fig2, use_container_width=True)
+      if score_note:
+          st.caption(score_note)
     
       # Scatter plot in the second column
 with col4:
       # st.subheader("📆 Scatter Chart: ")
-      scatter_fig2 = px.scatter(grouped_data,
+      scatter_fig2 = px.scatter(score_data,
                       x='Date',
                       y='Compscore',
                       color ='Indicator',  # Color lines by indicator
@@ -137,6 +175,8 @@ with col4:
                       )
       #scatter_fig.update_layout(width=844, height=390, autosize=False)
       st.plotly_chart(scatter_fig2, use_container_width=True)
+      if score_note:
+          st.caption(score_note)
 
 # save original code
 # chart = alt.Chart(summary).mark_bar().encode(
@@ -150,3 +190,7 @@ with col4:
 
 # st.altair_chart(chart, use_container_width=True)
 
+# Timing breakdown of this rerun (only recorded with NC_TRACE=1)
+trace.end()
+if run is not None and role == "admin":
+    st.sidebar.expander("⏱️ Timings").dataframe(run.table())
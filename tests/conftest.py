@@ -0,0 +1,18 @@
+"""
+Shared synthetic frames for the equivalence tests: the aggregation modules are
+checked against plain pandas groupby/resample on the same rows.
+"""
+import pytest
+
+from bench.synth import make_checkins, make_journal
+from ncdash.data import finalize_frame
+
+
+@pytest.fixture(scope="session")
+def checkins():
+    return finalize_frame("checkins", make_checkins(30_000, seed=7))
+
+
+@pytest.fixture(scope="session")
+def journal():
+    return finalize_frame("journal", make_journal(30_000, seed=7))
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from ncdash import hll
+from ncdash.rollup import DaySketches, build_rollup, session_counts
+
+
+@pytest.mark.parametrize("cardinality", [100, 5_000, 200_000])
+@pytest.mark.parametrize("precision", [10, 14])
+def test_estimate_within_error(cardinality, precision):
+    values = np.arange(cardinality, dtype=np.int64) * 7919
+    registers = hll.sketch_groups(np.zeros(len(values), dtype=np.intp), values, 1, precision)
+    estimate = float(hll.estimate(registers[0]))
+    # Four standard errors: a failure is far outside the estimator's spread
+    assert abs(estimate - cardinality) / cardinality <= 4 * hll.standard_error(precision)
+
+
+def test_merge_equals_sketch_of_union():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 50_000, 20_000)
+    groups = rng.integers(0, 4, len(values))
+    per_group = hll.sketch_groups(groups, values, 4, 12)
+    whole = hll.sketch_groups(np.zeros(len(values), dtype=np.intp), values, 1, 12)[0]
+    assert np.array_equal(hll.merge(per_group), whole)
+
+
+def test_precision_for_error():
+    assert hll.standard_error(hll.precision_for(0.02)) <= 0.02
+    assert hll.precision_for(1e-9) == hll.MAX_PRECISION
+
+
+def test_day_sketches_track_exact_counts(checkins):
+    rollup = build_rollup(checkins)
+    sketches = DaySketches.build(rollup, error=0.01)
+    for freq in ("D", "ME"):
+        exact = session_counts(rollup, freq)
+        estimated = sketches.counts(freq)
+        assert estimated.index.equals(exact.index)
+        relative = np.abs(estimated.to_numpy() - exact.to_numpy()).sum() / exact.to_numpy().sum()
+        assert relative <= 2 * sketches.error
+    window = sketches.window(np.datetime64("2024-06-01"), np.datetime64("2024-07-01"))
+    exact = session_counts(rollup[(rollup["Date"] >= "2024-06-01") & (rollup["Date"] < "2024-07-01")], "YE").sum()
+    assert abs(window.total() - exact) / exact <= 4 * sketches.error
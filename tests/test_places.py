@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+from ncdash.places import PlaceIndex
+
+
+def expected_totals(journal, emails, begin, end):
+    rows = journal[(journal["Timestamp"] >= begin) & (journal["Timestamp"] < end)]
+    if emails is not None:
+        rows = rows[rows["User email"].isin(emails)]
+    return rows.groupby("n_Place", observed=True).agg(Count=("n_Place", "size"), SumMin=("n_Duration", "sum"))
+
+
+def test_range_totals_match_groupby(journal):
+    index = PlaceIndex(journal)
+    rng = np.random.default_rng(11)
+    emails = journal["User email"].cat.categories
+    days = pd.date_range(journal["Timestamp"].min().normalize(), journal["Timestamp"].max().normalize())
+    for _ in range(50):
+        first, last = sorted(rng.choice(len(days), 2))
+        begin, end = days[first], days[last] + pd.Timedelta(days=1)
+        users = None if rng.random() < 0.5 else list(rng.choice(emails, 3, replace=False))
+        totals = index.totals(users, begin, end)
+        expected = expected_totals(journal, users, begin, end)
+
+        got = pd.DataFrame({"Count": totals.counts, "SumMin": totals.minutes},
+                           index=pd.Index(totals.places, name="n_Place"))
+        assert len(totals) == len(expected)
+        assert got["Count"].tolist() == expected["Count"].tolist()
+        assert got["SumMin"].tolist() == expected["SumMin"].tolist()
+        assert totals.total_minutes() == int(expected["SumMin"].sum())
+
+
+def test_open_bounds_cover_everything(journal):
+    totals = PlaceIndex(journal).totals()
+    assert totals.counts.sum() == len(journal)
+    assert totals.total_minutes() == int(journal["n_Duration"].sum())
+
+
+def test_top_matches_nlargest(journal):
+    totals = PlaceIndex(journal).totals()
+    top = totals.top(10)
+    expected = journal.groupby("n_Place", observed=True)["n_Duration"].sum().sort_values(
+        ascending=False, kind="stable").head(10)
+    assert top["SumMin"].tolist() == expected.tolist()
+    assert top["n_Place"].tolist() == list(expected.index)
+
+
+def test_total_minutes_include_rows_without_a_place(journal):
+    blanked = journal.copy()
+    blanked.loc[blanked.index[::7], "n_Place"] = None
+    index = PlaceIndex(blanked)
+    begin, end = pd.Timestamp("2024-02-01"), pd.Timestamp("2024-08-01")
+    users = list(blanked["User email"].cat.categories[:3])
+    for emails in (None, users):
+        rows = blanked[(blanked["Timestamp"] >= begin) & (blanked["Timestamp"] < end)]
+        if emails is not None:
+            rows = rows[rows["User email"].isin(emails)]
+        totals = index.totals(emails, begin, end)
+        assert totals.total_minutes() == int(rows["n_Duration"].sum())
+        # Place sums still leave the blank rows out
+        assert totals.counts.sum() == rows["n_Place"].notna().sum()
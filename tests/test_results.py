@@ -0,0 +1,27 @@
+import threading
+
+from ncdash import results
+from ncdash.results import ResultStore
+
+
+def test_fetch_writes_in_the_background(tmp_path):
+    store = ResultStore(root=str(tmp_path))
+    key = ("TEST", None, 1)
+    writers = []
+    put = store.put
+    store.put = lambda *args, **kwargs: writers.append(threading.current_thread()) or put(*args, **kwargs)
+
+    assert store.fetch(key, lambda: {"rows": 3}) == {"rows": 3}
+    results.flush()
+    assert writers and threading.current_thread() not in writers
+    assert store.get(key) == {"rows": 3}
+    # Served from the store: compute is not called again
+    assert store.fetch(key, lambda: 1 / 0) == {"rows": 3}
+
+
+def test_evict_spares_kept_paths(tmp_path):
+    store = ResultStore(root=str(tmp_path), max_bytes=10_000)
+    paths = [store.put(("TEST", i), bytes(4_000), evict=False) for i in range(5)]
+    # Only unkept results are evicted, even when the kept ones alone exceed the bound
+    assert store.evict(keep=paths[2:]) == 2
+    assert sorted(path for path, _, _ in store.entries()) == sorted(paths[2:])
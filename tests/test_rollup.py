@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from ncdash.index import UserTimeIndex
+from ncdash.rollup import (
+    build_rollup,
+    filter_rollup,
+    indicator_daily,
+    mean_scores,
+    merge_rollups,
+    read_rollup,
+    session_counts_by,
+    total_sessions,
+    write_rollup,
+)
+
+
+def test_session_counts_match_raw_rows(checkins):
+    rollup = build_rollup(checkins)
+    counts = session_counts_by(rollup)
+    daily = checkins.groupby(checkins["Timestamp"].dt.normalize())["Session id"].nunique()
+    assert counts["D"].to_numpy().tolist() == daily.to_numpy().tolist()
+    for freq in ("W", "ME", "YE"):
+        expected = checkins.set_index("Timestamp")["Session id"].resample(freq).nunique()
+        assert counts[freq].to_numpy().tolist() == expected.to_numpy().tolist()
+    assert total_sessions(rollup) == checkins["Session id"].nunique()
+    assert total_sessions(rollup, "Sess6") == checkins["sess6digit"].nunique()
+
+
+def test_indicator_daily_matches_groupby(checkins):
+    rollup = build_rollup(checkins)
+    got = indicator_daily(rollup)
+    days = checkins["Timestamp"].dt.normalize().rename("Date")
+    expected = checkins.groupby([days, "Indicator"], observed=True).agg(
+        Count=("sess6digit", "nunique"),
+        Compscore=("composite_score", "mean"),
+        Nrating=("Rating", "mean"),
+    ).reset_index()
+    assert got["Count"].tolist() == expected["Count"].tolist()
+    np.testing.assert_allclose(got["Compscore"], expected["Compscore"], rtol=1e-6)
+    np.testing.assert_allclose(got["Nrating"], expected["Nrating"])
+
+    rating, score = mean_scores(rollup)
+    assert np.isclose(rating, checkins["Rating"].mean())
+    assert np.isclose(score, checkins["composite_score"].astype("float64").mean())
+
+
+def test_filtered_slice_matches_filtered_rows(checkins):
+    rollup = UserTimeIndex(build_rollup(checkins), time_col="Date")
+    emails = rollup.emails[:3]
+    start, end = pd.Timestamp("2024-03-01"), pd.Timestamp("2024-09-30")
+    rows = checkins[checkins["User email"].isin(emails)
+                    & (checkins["Timestamp"] >= start) & (checkins["Timestamp"] < end + pd.Timedelta(days=1))]
+    assert total_sessions(filter_rollup(rollup, start, end, emails=emails)) == rows["Session id"].nunique()
+
+
+def test_merged_and_stored_rollup_matches_full_build(checkins, tmp_path):
+    # Split mid-day so some (user, day, indicator) keys are in both halves
+    half = len(checkins) // 2
+    merged = merge_rollups(build_rollup(checkins.iloc[:half], values=True),
+                           build_rollup(checkins.iloc[half:], values=True))
+    path = str(tmp_path / "rollup.parquet")
+    write_rollup(merged, path)
+    stored = read_rollup(path)
+    full = build_rollup(checkins)
+
+    assert len(stored) == len(full)
+    assert stored["Checkins"].tolist() == full["Checkins"].tolist()
+    assert total_sessions(stored) == total_sessions(full)
+    for freq in ("D", "W"):
+        assert (session_counts_by(stored, (freq,))[freq].tolist()
+                == session_counts_by(full, (freq,))[freq].tolist())
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ncdash.timeagg import FREQS, TimeBuckets, bucket_keys, bucket_labels
+
+
+@pytest.mark.parametrize("freq", ["W", "ME", "YE"])
+def test_bucket_labels_match_resample(freq):
+    dates = pd.date_range("2023-12-25", "2025-03-03", freq="D")
+    days = dates.to_numpy().astype("datetime64[D]").astype(np.int64)
+    labels = bucket_labels(bucket_keys(days, freq), freq)
+    expected = pd.Series(1, index=dates).resample(freq).sum().index
+    assert list(np.unique(labels)) == list(expected.to_numpy().astype("datetime64[D]"))
+
+
+def test_distinct_matches_groupby_and_resample(checkins):
+    counts = TimeBuckets(checkins["Timestamp"]).distinct(checkins["Session id"])
+    assert set(counts) == set(FREQS)
+
+    daily = checkins.groupby(checkins["Timestamp"].dt.normalize())["Session id"].nunique()
+    assert counts["D"].to_numpy().tolist() == daily.to_numpy().tolist()
+    assert counts["D"].index.equals(daily.index.rename("Date"))
+    for freq in ("W", "ME", "YE"):
+        expected = checkins.set_index("Timestamp")["Session id"].resample(freq).nunique()
+        assert counts[freq].to_numpy().tolist() == expected.to_numpy().tolist()
+        assert counts[freq].index.equals(expected.index.rename("Date"))
+
+
+def test_grouped_distinct_matches_groupby(checkins):
+    days = checkins["Timestamp"].dt.normalize()
+    counts = TimeBuckets(days, groups=checkins["Indicator"], freqs=("D",)).distinct(
+        checkins["sess6digit"], name="Indicator")["D"]
+    expected = checkins.groupby([days.rename("Date"), "Indicator"], observed=True)["sess6digit"].nunique()
+    assert counts.to_numpy().tolist() == expected.to_numpy().tolist()
+    assert list(counts.index) == list(expected.index)
+
+
+def test_sums_match_resample(checkins):
+    sums = TimeBuckets(checkins["Timestamp"]).sums({"Rating": checkins["Rating"]})
+    for freq in ("W", "ME"):
+        expected = checkins.set_index("Timestamp")["Rating"].resample(freq).sum()
+        np.testing.assert_allclose(sums[freq]["Rating"].to_numpy(), expected.to_numpy())